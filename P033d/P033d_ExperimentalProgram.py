@@ -20,8 +20,10 @@ choice of art creation (perhaps reinforcement).
 
 # First we import the libraries relevant for this project
 from tkinter import Toplevel, Canvas, BOTH, TclError, Tk, Label, Button, \
-     StringVar, OptionMenu, IntVar, Radiobutton, Entry
-from graph import Graph
+     StringVar, OptionMenu, IntVar, Radiobutton, Entry, PhotoImage
+from face_engine import FaceEngine
+from painting import Painting
+from raster_faces import RasterFaces
 from tkinter import messagebox
 import functools
 from time import perf_counter, sleep
@@ -54,6 +56,15 @@ else:
     
 # Global variables 
 TIME = 0 # Gives a metric for relevative efficiency
+EXHAUSTIVE_INTERSECTS = 0 # Check new lines against every stored line (for verifying the line grid)
+INCREMENTAL_FACES = 1 # Only re-trace the faces a new line crosses (0 re-solves the whole graph every stroke)
+DUPLICATE_LINE_TOLERANCE = 1 # Pixels. Lines whose endpoints round to the same multiple of this count as already drawn
+SNAP_TOLERANCE = 0 # Pixels. Intersects and stroke endpoints this close to a point snap onto it (0 turns snapping off)
+FACE_WORKERS = 0 # Processes that solve large components of the graph when it is solved whole (0 solves in-process)
+RESUME_PAINTING = 0 # Continue the subject's painting from its last snapshot instead of starting a blank canvas
+SNAPSHOT_EVERY = 10 # Lines. Save a snapshot of the painting after this many lines (0 only saves one at exit)
+RASTER_FACES = 0 # Find regions on a pixel mask of the lines instead of faces of the graph (needs NumPy)
+FACE_DEBOUNCE = 0 # Milliseconds. Find the faces of lines drawn within this long of each other together, once (0 finds them after every line)
 
 if operant_box_version:
     data_folder_directory = str(os_path.expanduser('~'))+"/Desktop/Data/P033_data/P033d_FoodvArt"
@@ -127,11 +138,6 @@ def timer(func):
         return value
     return wrapper_timer
 
-class Point:
-    def __init__(self, coord, ind):
-        self.ind = ind
-        self.coord = coord
-
 class Paint:
     def __init__(self, root, artist_name, VR_val, record_data):
         self.root = root
@@ -189,39 +195,31 @@ class Paint:
         self.showLines = 1
         
         # Below, we store all necessary data
-        self.currLineIndex = 0 # increment after every line drawn
-        self.currPointIndex = 0 # increment after every point of intersection is found
-
-        # Stores all lines and the lines they intersect with by their index
-        # {line0 : [(line1, line2), (line3, line4)... ], ...}
-        self.lines = {}
+        # Lines, points of intersection and faces (polygons) of the painting, see face_engine.py
+        self.engine = FaceEngine(SNAP_TOLERANCE, DUPLICATE_LINE_TOLERANCE, INCREMENTAL_FACES,
+                                 EXHAUSTIVE_INTERSECTS, FACE_WORKERS, findFaces=not RASTER_FACES)
 
         # Store all line ids in a list. When we need to remove lines, this is useful.
         self.lineIds = []
-        
-        # An adjacency list to store all vertices and edges of our directed graph
-        self.graph = {}
-
-        # Stores all points of intersection
-        # {line0 : [P1, P2, ... ]} where P1, P2, etc. are Point objects defined in the Point class
-        self.intersects = {}
-
-        # Maps line intersect coords to pos coords
-        # {(lineIndex0, lineIndex1) : (x, y)}
-        self.lineToPosCoords = {}
 
-        # Maps point index to position coordinates
-        self.pointToPosCoords = {}
+        # Maps the face id of each polygon in self.engine.polygons to its canvas item id
+        self.polygonItems = {}
 
-        # Maps point position coordinates to indices
-        self.posCoordsToPoints = {}
+        # The resolveFaces call FACE_DEBOUNCE has pending (None if there is none)
+        self.pendingFaces = None
 
-        # Maps point index (0-n) to their line indices (0-m)
-        self.pointToLineIndices = {}
+        # Pixel mask of the lines and the regions between them, if RASTER_FACES is on.
+        # Regions are painted into self.rasterImage, below the lines, instead of being polygons
+        self.rasterFaces = None
+        if RASTER_FACES:
+            self.rasterFaces = RasterFaces(self.width, self.height, 4) # out to the border lines
+            self.rasterColors = {} # {label : color}
+            self.rasterImage = PhotoImage(width=self.width, height=self.height)
+            self.canvas.create_image(0, 0, image=self.rasterImage, anchor="nw")
 
-        # Stores all polygons and their ids
-        # {[p1,p2,...pn] : id, ...}
-        self.polygons = {}
+        # The painting's lines and faces with the bookkeeping around them that has nothing to do
+        # with the canvas: lines whose faces are pending, data rows to fill in, snapshots (see painting.py)
+        self.painting = Painting(self.engine, self.rasterFaces)
 
         # Create data objects
         self.start_time = datetime.now() # Set start time
@@ -232,7 +230,7 @@ class Paint:
         data_headers = [
             "TrialNum", "TrialType", "LeftButtonStim", "RightButtonStim",
             "EventType", "SessionTime", "IRI", "X1","Y1","PrevX","PrevY",
-            "PaintBackgroundColor", "SizeOfLine", "NPolygons","NDots",
+            "PaintBackgroundColor", "SizeOfLine", "NPolygons", "Coverage", "PolygonID", "PolygonArea", "NDots",
             "NLines", "PaintChoices", "FoodChoices", "NumReinforcers",
             "StartTime", "Experiment", "P033_Phase", "BoxNumber",  "Subject",
             "Date"
@@ -376,15 +374,18 @@ class Paint:
 
         # Canvas creation stuff
         # make the entire canvas a polygon
-        offset = 4
-        self.drawLine([(0-offset, 0-offset),
-                       (self.width+offset, 0-offset)]) # upper-left to upper-right
-        self.drawLine([(self.width+offset, 0-offset),
-                       (self.width+offset, self.height+offset)]) # upper-right to lower-right
-        self.drawLine([(self.width+offset, self.height+offset),
-                       (0-offset, self.height+offset)]) # lower-right to lower-left
-        self.drawLine([(0-offset, self.height+offset),
-                       (0-offset, 0-offset)]) # lower-left to upper-left
+        # (or pick up the subject's painting where the last session left it)
+        self.snapshotFile = f"{data_folder_directory}/{self.subject}/{self.subject}_painting.pkl"
+        if not (RESUME_PAINTING and self.loadSnapshot()):
+            offset = 4
+            self.drawFrame([[(0-offset, 0-offset),
+                                  (self.width+offset, 0-offset)], # upper-left to upper-right
+                                 [(self.width+offset, 0-offset),
+                                  (self.width+offset, self.height+offset)], # upper-right to lower-right
+                                 [(self.width+offset, self.height+offset),
+                                  (0-offset, self.height+offset)], # lower-right to lower-left
+                                 [(0-offset, self.height+offset),
+                                  (0-offset, 0-offset)]]) # lower-left to upper-left
         
         self.coverState = None
         self.paintButtonPressed = False
@@ -789,77 +790,46 @@ class Paint:
         return color_choice
     
 
-    # Return true if line segments AB and CD intersect.
-    # This will be used in the findIntersects method
-    def hasIntersect(self, A, B, C, D):
-        def ccw(A,B,C):
-            return (C[1]-A[1]) * (B[0]-A[0]) > (B[1]-A[1]) * (C[0]-A[0])
-        return ccw(A,C,D) != ccw(B,C,D) and ccw(A,B,C) != ccw(A,B,D)
-
-    # Every time a line segment is drawn, we will call this function on that line segment
-    # For each line that the new line intersects, we will append the intersect coord (x, y) to 
-    # the values (lists) of both lines in self.intersects
-    # Return all intersects between line and all stored lines as a list of 2D points
-    @timer
-    def findIntersects(self, line):
-        # helper function to find intersection between 2 lines
-        def getIntersect(line1, line2):
-
-            xdiff = (line1[0][0] - line1[1][0], line2[0][0] - line2[1][0])
-            ydiff = (line1[0][1] - line1[1][1], line2[0][1] - line2[1][1])
-
-            def det(a, b):
-                return a[0] * b[1] - a[1] * b[0]
-
-            div = det(xdiff, ydiff)
-            if div == 0:
-                return None
-
-            d = (det(*line1), det(*line2))
-            x = det(d, xdiff) / div
-            y = det(d, ydiff) / div
-            return (x, y)
-
-        # loop through all stored lines, check intersect between line and each line l2 in list
-        for lineNum, l2 in self.lines.items():
-            if self.hasIntersect(line[0], line[1], l2[0], l2[1]) == False:
-                continue
-            p = getIntersect(line, l2)
-            if p is not None: # if line and l2 intersecting
-                self.lineToPosCoords[(lineNum, self.currLineIndex)] = p
-                self.pointToPosCoords[self.currPointIndex] = p
-                self.posCoordsToPoints[p] = self.currPointIndex
-
-                # add indices of intersecting lines (values) associated with point (key) to the pointToLineIndices dict
-                self.pointToLineIndices[self.currPointIndex] = [self.currLineIndex, lineNum]
-
-                # update self.intersects dict
-                self.intersects.setdefault(lineNum, []).append(Point(p, self.currPointIndex))
-                self.intersects.setdefault(self.currLineIndex, []).append(Point(p, self.currPointIndex))
-                
-                # sort lists in self.intersects
-                self.intersects[lineNum] = sorted(self.intersects[lineNum], key=lambda x : x.coord)
-                self.intersects[self.currLineIndex] = sorted(self.intersects[self.currLineIndex], key=lambda x : x.coord)
-
-                self.currPointIndex += 1
-
-    # Function to update self.graph after new shapes are drawn onto canvas
+    # Function to paint the regions of the pixel mask (raster mode) after line was drawn.
+    # The whole canvas is the first region. When a line splits a region, its largest piece
+    # keeps the region's color (as a polygon keeps its canvas item in replacePolygons)
+    # and every other piece is painted a new color, one row of pixels at a time
     @timer
-    def updateEdges(self):
-        self.graph = {} # clear the graph
-
-        # identify all points that are not involved in a cycle
-        self.toExclude = set()
-        for points in self.intersects.values():
-            if len(points) == 1:
-                self.toExclude.add(points[0].ind)
-
-        for _list in self.intersects.values():
-            if len(_list) < 2: continue
-            for i in range(len(_list)-1):
-                u, v = _list[i], _list[i+1]
-                if (u.ind not in self.toExclude) and (v.ind not in self.toExclude):
-                    self.graph.setdefault(u, []).append(v)
+    def fillRegions(self, line):
+        if not self.rasterColors:
+            self.rasterColors[1] = self.generateColor()
+            self.rasterImage.put(self.rasterColors[1], to=(0, 0, self.width, self.height))
+
+        created, parents, removed = self.rasterFaces.addLine(line)
+        children = {}
+        for label, parent in parents.items():
+            children.setdefault(parent, []).append(label)
+        for parent, labels in children.items():
+            labels.sort(key=lambda l: self.rasterFaces.areas[l], reverse=True)
+            self.rasterColors[labels[0]] = self.rasterColors[parent]
+            for label in labels[1:]:
+                color = self.rasterColors[label] = self.generateColor()
+                for r, start, end in created[label]:
+                    # runs can reach past the canvas
+                    start, end = max(start, 0), min(end, self.width)
+                    if 0 <= r < self.height and start < end:
+                        self.rasterImage.put(color, to=(start, r, end, r+1))
+        for label in removed:
+            del self.rasterColors[label]
+
+    # Function to remove a line (and its points of intersection) that was drawn onto canvas.
+    # The faces on either side of the line are merged (see FaceEngine.remove_segment)
+    def removeLine(self, lineNum):
+        self.resolveFaces() # the polygons of lines FACE_DEBOUNCE deferred have to exist to be removed
+        self.updatePolygons(*self.engine.remove_segment(lineNum))
+        self.redraw()
+
+    # callback to remove the last line drawn, if it can be (see Painting.lastRemovableLine)
+    def undoLine(self, event):
+        lineNum = self.painting.lastRemovableLine()
+        if lineNum is None: return
+        self.removeLine(lineNum)
+        self.write_data(None, "line_removed")
 
     # draws a red dot at specified point
     def drawDot(self, point):
@@ -868,57 +838,54 @@ class Paint:
                                 fill="#FF0000", outline="#FF0000")
         return id
 
-    # function to find all new polygons since last shape drawn
-    def findNewPolygons(self):
-        def printPolygon(p, end='\n'):
-            for point in p:
-                print(self.posCoordsToPoints[point], end=' ')
-            print(end=end)
+    # canvas item id of the polygon shown at (x, y). Polygons can overlap, and the one
+    # created last is drawn on top. Returns "NA" if no polygon is there
+    # In raster mode, returns the label of the region at (x, y) instead
+    def polygonAt(self, x, y):
+        id = self.painting.faceAt(x, y)
+        if id is None: return "NA"
+        return id if self.rasterFaces is not None else self.polygonItems[id]
+
+    # area of the polygon shown at (x, y) (see polygonAt), rounded to the pixel.
+    # Returns "NA" if no polygon is there
+    def polygonAreaAt(self, x, y):
+        area = self.painting.faceAreaAt(x, y)
+        return "NA" if area is None else round(area)
+
+    # Function to update the canvas items of the polygons after the engine added or removed lines.
+    # A new face is filled with a random color. A face id that was removed and is new again
+    # moved to new vertices (e.g. a new point on its border) and keeps its canvas item (and color).
+    # Other removed faces are deleted
+    def updatePolygons(self, newFaces, removedFaces):
+        moved = set(newFaces.values())
+        for id in removedFaces.values():
+            if id not in moved: self.canvas.delete(self.polygonItems.pop(id))
+
+        # new faces are created in the order of their ids, so the newest is on top
+        for polygon, id in sorted(newFaces.items(), key=lambda item: item[1]):
+            coords = self.engine.polygonCoords(polygon)
+            if id in self.polygonItems:
+                self.canvas.coords(self.polygonItems[id], [c for point in coords for c in point])
+            else:
+                color = self.generateColor()
+                self.polygonItems[id] = self.canvas.create_polygon(coords, fill=color, outline=color, width=0.5)
+
+    # draw the faces that changed, from Painting.resolve
+    def drawFaces(self, changes):
+        # in raster mode, the regions on the pixel mask take the place of the graph's faces
+        if self.rasterFaces is not None:
+            for lineNum in changes:
+                self.fillRegions(self.engine.lines[lineNum])
+                self.painting.fillRows(lineNum + 1)
+        else:
+            self.updatePolygons(*changes)
 
-        # if graph contains only 1 directed edge, there are no polygons
-        if len(self.graph) <= 1:
-            return None
+    # redraw all lines, and the demo labels over them
+    def redraw(self):
+        if self.showLines: self.drawLines()
 
-        g = Graph(self.graph) # passing in directed graph
-        regions = g.solve() # list of sublists containing point indices (0 - n)
-        
-        polygons = set()
-
-        # for each polygon
-        for r in regions:
-            # convert point index to position coords
-            polygon = [self.pointToPosCoords[p] for p in r] 
-
-            # reorder polygon vertices while preserving edge relationships
-            # we want the top-left-most vertex as the first item
-            forwardList = polygon + polygon
-            left = forwardList.index(min(polygon))
-            if forwardList[left][0] > forwardList[left + 1][0]:
-                forwardList.reverse() 
-                left = forwardList.index(min(polygon))
-            polygon = forwardList[left:left+len(polygon)]
-            polygons.add(tuple(polygon))
-
-        newPolygons = list(polygons - set(self.polygons.keys()))
-        
-        # if polygon is new
-        for polygon in newPolygons:
-            isNew = True
-            # if polygon is already in stored polygons, don't add it again
-            for curr in self.polygons.keys():
-                currSet, polygonSet = set(curr), set(polygon)
-                if currSet == polygonSet or len(currSet - polygonSet) == 0 or len(polygonSet - currSet) == 0: 
-                    isNew = False
-            
-            # if new polygon, fill with random color and add its vertices and id to the polygons dict
-            if isNew:
-                color = self.generateColor()
-                id = self.canvas.create_polygon(polygon, fill=color, outline=color, width=0.5)
-                self.polygons[polygon] = id # add new polygon to list
-                # 
-        # print("polygons:")
-        # for p in self.polygons:
-        #     printPolygon(p, end=' | ')
+        if self.demo:
+            self.drawDemoLabels()
 
     # redraw all lines
     def drawLines(self):
@@ -929,84 +896,105 @@ class Paint:
         self.lineIds = []
         
         # draw all lines
-        for line in self.lines.values():
+        for line in self.engine.lines.values():
             id = self.canvas.create_line(line, width=0.5)
             self.lineIds.append(id)
 
-    # function to extend line by a factor of d. 
-    # this is useful for intersection detection
-    def extendLine(self, line, d):
-        p1, p2 = line[0], line[1]
-        mag = ((p2[0]-p1[0])**2 + (p2[1]-p1[1])**2) ** (1/2) # magnitude
-        
-        if mag != 0:
-            # new coords
-            x1 = p1[0] - d * (p2[0]-p1[0]) / mag
-            y1 = p1[1] - d * (p2[1]-p1[1]) / mag
-            x2 = p2[0] + d * (p2[0]-p1[0]) / mag
-            y2 = p2[1] + d * (p2[1]-p1[1]) / mag
-        else:
-            # new coords
-            x1 = p1[0] - d * (p2[0]-p1[0])
-            y1 = p1[1] - d * (p2[1]-p1[1])
-            x2 = p2[0] + d * (p2[0]-p1[0])
-            y2 = p2[1] + d * (p2[1]-p1[1])
-        
-        return [(x1, y1), (x2, y2)]
-
     # draw line onto canvas, update data
+    @timer
     def drawLine(self, line):
-        # increase line length slightly
-        line = self.extendLine(line, 3)
-
-        # sort line endpoints
-        # if line is already in list, don't do anything
-        line = sorted(line)
-        if line in self.lines.values():
-            print("line already drawn")
+        # if line (or one within DUPLICATE_LINE_TOLERANCE of it) was already drawn,
+        # log it and don't do anything else
+        if not self.painting.addLine(line):
+            self.write_data(None, "line_already_drawn")
             return
 
-        # find intersects between new line and all existing lines
-        self.findIntersects(line)
-        
-        # add new line to lines dict
-        self.lines[self.currLineIndex] = line
-
-        # increment current line number
-        self.currLineIndex += 1
+        # find the faces the line changed and draw them. With FACE_DEBOUNCE, resolveFaces does this
+        # FACE_DEBOUNCE ms after the first line since faces were last found, for every line drawn until then
+        if not FACE_DEBOUNCE:
+            self.resolveFaces()
+        else:
+            if self.pendingFaces is None:
+                self.pendingFaces = self.root.after(FACE_DEBOUNCE, self.resolveFaces)
+            self.redraw()
 
-        # update edges
-        self.updateEdges()
+        # save a snapshot of the painting every SNAPSHOT_EVERY lines
+        if SNAPSHOT_EVERY and self.engine.currLineIndex % SNAPSHOT_EVERY == 0:
+            self.saveSnapshot()
 
-        # find all polygons and fill them
-        self.findNewPolygons()
+    # find and draw the faces of the lines added to self.painting since they were last found,
+    # and fill in the data rows written in the meantime (see Painting.logRow).
+    # Called by drawLine, by root.after with FACE_DEBOUNCE, and before anything that needs the polygons up to date
+    @timer
+    def resolveFaces(self):
+        if self.pendingFaces is not None:
+            self.root.after_cancel(self.pendingFaces)
+            self.pendingFaces = None
+        if not self.painting.isPending(): return
+
+        self.drawFaces(self.painting.resolve())
+        self.redraw() # over the new polygons
+        self.painting.fillRows()
+
+    # draw many lines onto canvas at once.
+    # Gives the same lines, points and polygons as calling drawLine on each line in order,
+    # but the engine only updates edges and faces (and lines are redrawn) once for the whole batch
+    @timer
+    def drawLines_many(self, lines):
+        for _ in range(self.painting.addLines(lines)):
+            self.write_data(None, "line_already_drawn")
+        self.resolveFaces()
+
+    # draw the border of the canvas. The whole canvas polygon is the background,
+    # and is never replaced by the faces of later lines (see FaceEngine.add_frame)
+    def drawFrame(self, lines):
+        self.drawFaces(self.painting.addFrame(lines))
+        self.redraw()
+
+    # save the painting (see Painting.save) with the color of each polygon
+    # to self.snapshotFile, so the subject can continue it next session (see RESUME_PAINTING)
+    def saveSnapshot(self):
+        self.resolveFaces() # so every polygon has its color
+        self.painting.save(self.snapshotFile, {
+            "colors": {id: self.canvas.itemcget(item, "fill") for id, item in self.polygonItems.items()},
+            "background_color": self.background_color,
+            })
+
+    # load the painting saved by saveSnapshot and draw it. Returns False if there is no snapshot
+    def loadSnapshot(self):
+        snapshot = self.painting.load(self.snapshotFile)
+        if snapshot is None: return False
+        self.background_color = snapshot["background_color"]
+
+        # draw the polygons back in the order of their ids, so the same ones are on top
+        for polygon, id in sorted(self.engine.polygons.items(), key=lambda item: item[1]):
+            color = snapshot["colors"][id]
+            self.polygonItems[id] = self.canvas.create_polygon(self.engine.polygonCoords(polygon),
+                                                               fill=color, outline=color, width=0.5)
 
-        # draw all lines onto canvas
         if self.showLines: self.drawLines()
+        return True
 
-        if self.demo:
-            self.drawDemoLabels()
-
-    @timer
     def drawDemoLabels(self):
         for id in self.demoLabels:
             self.canvas.delete(id)
         self.demoLabels = []
 
         # draw edges
-        for u in self.graph:
-            for v in self.graph[u]:
-                id = self.canvas.create_line((*u.coord, *v.coord), width=2, fill="blue", arrow='last')
-                self.demoLabels.append(id)
+        vertices = self.engine.vertices
+        for u, v in self.engine.edges():
+            id = self.canvas.create_line((*vertices[u], *vertices[v]), width=2, fill="blue", arrow='last')
+            self.demoLabels.append(id)
 
         # draw point numbers
-        for point, coord in self.pointToPosCoords.items():
+        for point in self.engine.pointToLineIndices:
+            coord = vertices[point]
             id = self.canvas.create_text(coord[0], coord[1] + 14, text=f"{point}")
             self.demoLabels.append(id)
 
         # draw points
-        for point in self.lineToPosCoords.values():
-            id = self.drawDot(point)
+        for point in self.engine.lineToPoints.values():
+            id = self.drawDot(vertices[point])
             self.demoLabels.append(id)
 
 # Keybound commands:
@@ -1105,7 +1093,10 @@ class Paint:
             self.PrevY, # Previous y coordinate
             self.background_color,
             line_length,
-            len(self.polygons) - 1, # Number of polygons w/o background (?)
+            "NA", # Number of polygons w/o background (?), filled in below
+            "NA", # Fraction of the canvas covered by polygons w/o background, filled in below
+            "NA", # Canvas id of the polygon pecked, filled in below
+            "NA", # Area of the polygon pecked, filled in below
             self.dot_counter, # Number of points
             len(self.lineIds) - 4, # Number of lines
             self.paint_choices,
@@ -1118,6 +1109,20 @@ class Paint:
             self.subject,
             date.today() # Today's date as "MM-DD-YYYY"
             ])
+
+        # Number of polygons (regions in raster mode) w/o background and the fraction of the canvas
+        # they cover, and the polygon under a paint peck and its area.
+        # "pending" while FACE_DEBOUNCE defers finding faces, until resolveFaces fills them in
+        # with the faces of the lines drawn by then
+        headers = self.session_data_frame[0]
+        faceValues = {
+            headers.index("NPolygons"): self.painting.polygonCount,
+            headers.index("Coverage"): lambda: round(self.painting.polygonArea() / (self.width * self.height), 4),
+            }
+        if event_type == "paint_peck":
+            faceValues[headers.index("PolygonID")] = lambda: self.polygonAt(x, y)
+            faceValues[headers.index("PolygonArea")] = lambda: self.polygonAreaAt(x, y)
+        self.painting.logRow(self.session_data_frame[-1], faceValues)
         
         # Update the "previous" response time
         if event != None:
@@ -1128,7 +1133,7 @@ class Paint:
         data_headers = [
             "TrialNum", "TrialType", "LeftButtonStim", "RightButtonStim",
             "EventType", "SessionTime", "IRI", "X1","Y1","PrevX","PrevY",
-            "PaintBackgroundColor", "SizeOfLine", "NPolygons","NDots",
+            "PaintBackgroundColor", "SizeOfLine", "NPolygons", "Coverage", "PolygonID", "PolygonArea", "NDots",
             "NLines", "PaintChoices", "FoodChoices", "NumReinforcers",
             "StartTime", "Experiment", "P033_Phase", "BoxNumber",  "Subject",
             "Date"
@@ -1157,7 +1162,10 @@ class Paint:
             print(f"\n- Data file written to {myFile_loc}")
             
     def exit_program(self, event):
+        self.resolveFaces() # fill in the polygon counts before the data is written
         self.write_comp_data()
+        self.saveSnapshot()
+        self.engine.close()
         self.save_image()
         rpi_board.write(house_light_GPIO_num,
                                 False) # Turn off the house light
@@ -1189,6 +1197,7 @@ def main(artist_name, VR_val, record_data):
     print("(spacebar) toggle labels")
     print("left mouse button to draw")
     print("right mouse button to cancel draw")
+    print("(u) remove last line")
     # Setup Canvas
     root = Toplevel()
     root.title("Paint Program with Polygon Detection")
@@ -1200,6 +1209,7 @@ def main(artist_name, VR_val, record_data):
     root.bind("<Motion>", paint.onMouseMove)
     # root.bind("<space>", paint.toggleDemo)
     root.bind("l", paint.toggleLines)
+    root.bind("u", paint.undoLine)
 
     root.mainloop()
     
@@ -0,0 +1,67 @@
+# Compares the raster regions (RasterFaces, see RASTER_FACES) with the faces of the graph
+# (FaceEngine) on seeded random drawings, without Tk. For each drawing, prints the time each
+# takes to add the lines one by one, as Paint does, and the fraction of sampled pixel pairs on
+# which they agree: two pixels off the lines are in the same region of the pixel mask exactly
+# when they are in the same polygon of the graph. Requires NumPy (for RasterFaces).
+#
+#   python compare_faces.py [number of drawings] [number of lines]
+
+import random
+import sys
+from time import perf_counter
+
+from face_engine import FaceEngine
+from raster_faces import RasterFaces
+
+WIDTH, HEIGHT = 800, 600
+OFFSET = 4 # border lines are drawn this far outside the canvas, as Paint draws them
+
+# border of the canvas, as Paint.drawFrame draws it
+def frameLines(width=WIDTH, height=HEIGHT, offset=OFFSET):
+    corners = [(-offset, -offset), (width+offset, -offset), (width+offset, height+offset), (-offset, height+offset)]
+    return [[corners[i-1], corners[i]] for i in range(len(corners))]
+
+# n lines between random points on the canvas
+def seededLines(seed, n, width=WIDTH, height=HEIGHT):
+    rng = random.Random(seed)
+    return [[(rng.randint(0, width), rng.randint(0, height)) for _ in range(2)] for _ in range(n)]
+
+# draw lines in a FaceEngine and in RasterFaces, each after the border.
+# Returns the engine, the raster and the seconds each took
+def drawBoth(lines, width=WIDTH, height=HEIGHT):
+    start = perf_counter()
+    engine = FaceEngine()
+    engine.add_frame(frameLines(width, height))
+    for line in lines:
+        engine.add_segment(line)
+    graphTime = perf_counter() - start
+
+    start = perf_counter()
+    raster = RasterFaces(width, height, OFFSET)
+    for line in frameLines(width, height) + lines:
+        raster.addLine(line)
+    rasterTime = perf_counter() - start
+    return engine, raster, graphTime, rasterTime
+
+# fraction of pairs of random pixels (both off the lines in the pixel mask) that are in the same
+# region of the mask exactly when their centers are in the same polygon of the engine
+def agreement(engine, raster, pairs=20000, seed=0):
+    rng = random.Random(seed)
+    agree = total = 0
+    while total < pairs:
+        (x1, y1), (x2, y2) = [(rng.randrange(raster.width), rng.randrange(raster.height)) for _ in range(2)]
+        label1, label2 = raster.regionAt(x1, y1), raster.regionAt(x2, y2)
+        if label1 is None or label2 is None: continue
+        sameFace = engine.polygonAt(x1 + 0.5, y1 + 0.5) == engine.polygonAt(x2 + 0.5, y2 + 0.5)
+        agree += (label1 == label2) == sameFace
+        total += 1
+    return agree / total
+
+if __name__ == "__main__":
+    drawings = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"{'seed':>4} | {'graph s':>8} | {'raster s':>8} | {'polygons':>8} | {'regions':>8} | agreement")
+    for seed in range(drawings):
+        engine, raster, graphTime, rasterTime = drawBoth(seededLines(seed, n))
+        print(f"{seed:>4} | {graphTime:>8.3f} | {rasterTime:>8.3f} | {len(engine.polygons) - 1:>8} | "
+              f"{len(raster.areas) - 1:>8} | {agreement(engine, raster):.4f}")
@@ -0,0 +1,849 @@
+from face_index import FaceGrid
+from face_metrics import FaceMetrics
+from graph import Graph, toCSR
+from line_index import LineGrid
+from line_store import LineStore, np
+from line_sweep import sweepPairs
+from point_index import PointGrid
+from subdivision import PlanarSubdivision
+from vertex_table import VertexTable
+from concurrent.futures import ProcessPoolExecutor
+from bisect import bisect
+
+# Geometry engine behind Paint in polygon_fill.py and P033d, with no Tk in it.
+# Keeps the lines drawn, their points of intersection, the graph and planar subdivision
+# of those points, and the faces (polygons) filled so far. add_segment() draws a line and
+# returns the faces it added and removed, and Paint only has to update its canvas to match.
+# Without a canvas, the engine can be run, profiled and replayed on its own, e.g.
+#
+#   engine = FaceEngine()
+#   for line in lines:
+#       newFaces, removedFaces = engine.add_segment(line)
+#
+# Points of intersection are integer vertex ids of self.vertices (see vertex_table.py), and
+# faces are tuples of them. Every face also has a face id, which stays the same when a line moves
+# the face to new vertices (e.g. a new point on its border). Paint keeps one canvas item (and
+# color) per face id.
+
+class FaceEngine:
+    # snapTolerance: pixels. Intersects and endpoints this close to a point snap onto it (0 turns snapping off)
+    # duplicateTolerance: pixels. Lines whose endpoints round to the same multiple of this count as already drawn
+    # incremental: only re-trace the faces a new line crosses (False re-solves the whole graph every line)
+    # exhaustive: check new lines against every stored line (for verifying the line grid)
+    # workers: processes that solve large components of the graph when it is solved whole (0 solves in-process)
+    # findFaces: False only keeps the lines and their points of intersection (see RASTER_FACES)
+    def __init__(self, snapTolerance=0, duplicateTolerance=1, incremental=True, exhaustive=False,
+                 workers=0, findFaces=True):
+        self.duplicateTolerance = duplicateTolerance
+        self.incremental = incremental
+        self.exhaustive = exhaustive
+        self.findFaces = findFaces
+
+        self.currLineIndex = 0 # increment after every line drawn
+
+        # Coordinates of all points of intersection, by vertex id
+        self.vertices = VertexTable()
+
+        # Stores all lines and the lines they intersect with by their index
+        # {line0 : [(line1, line2), (line3, line4)... ], ...}
+        self.lines = {}
+
+        # Maps the key (see lineKey) of every line drawn, before it was extended, to its index.
+        # Used to reject redrawn lines
+        self.lineKeys = {}
+
+        # Maps the index of every line to its key in self.lineKeys, so removing a line
+        # doesn't have to search the keys of every line drawn
+        self.lineToKey = {}
+
+        # Grid of canvas cells to the lines passing through them. Used to find
+        # which stored lines a new line could possibly intersect
+        self.lineGrid = LineGrid()
+
+        # Endpoints of all lines as rows of a NumPy array, in the same order as self.lines.
+        # Lets findIntersects check a new line against all candidates in one call (None without NumPy)
+        self.lineStore = LineStore() if np is not None else None
+
+        # An adjacency list to store all vertices and edges of our directed graph
+        # {p0 : [p1, p2, ... ]}. Only has the edges of self.core, the ones that can bound a face.
+        # It and the edge tables below are only kept when the whole graph is solved (not incremental)
+        self.graph = {}
+
+        # Stores the edges between neighboring points along each line
+        # {line0 : [(p0, p1), (p1, p2), ... ]}, so the edges of one line can be replaced
+        self.lineEdges = {}
+
+        # Both ends of every edge in self.lineEdges, with the number of lines that have the edge
+        # {p0 : {p1 : n1, p2 : n2, ... }}. Lines can share an edge (e.g. two lines through the same
+        # pair of points), but self.graph only gets each edge once
+        self.adjacency = {}
+
+        # Points of the 2-core of the edges: what is left after repeatedly removing points with
+        # fewer than 2 edges. A chain of edges hanging off a face can never bound one, so it is
+        # pruned here instead of giving Graph.solve wedges that never make a region
+        self.core = set()
+
+        # Stores indices of all points that are the only point of intersection on a line.
+        # These are left out of self.graph since they can't be part of a cycle
+        self.toExclude = set()
+
+        # Pool of worker processes for Graph.solve when the whole graph is solved (None if workers is 0)
+        self.faceExecutor = ProcessPoolExecutor(workers) if workers else None
+
+        # Planar subdivision of all points of intersection and the line pieces between them.
+        # Keeps track of every face so a new line only needs to split the faces it crosses
+        self.subdivision = PlanarSubdivision()
+
+        # Stores all points of intersection on each line, in order along the line
+        # {line0 : [p1, p2, ... ]} where p1, p2, etc. are vertex ids
+        self.intersects = {}
+
+        # Parameter t of each point in self.intersects along its line, in the same order
+        # {line0 : [t1, t2, ... ]}
+        self.intersectParams = {}
+
+        # Maps each pair of intersecting lines to their point of intersection
+        # {(lineIndex0, lineIndex1) : p0}
+        self.lineToPoints = {}
+
+        # Maps point index (0-n) to their line indices (0-m)
+        self.pointToLineIndices = {}
+
+        # Spatial hash of all points, used to snap new points onto nearby ones (None if snapTolerance is 0)
+        self.pointGrid = PointGrid(snapTolerance) if snapTolerance else None
+
+        # Stores all polygons (tuples of vertex ids) and their face ids
+        # {(p1,p2,...pn) : id, ...}
+        self.polygons = {}
+        self.nextPolygonId = 0
+
+        # Maps each polygon vertex to the stored polygons it is a vertex of
+        self.vertexToPolygons = {}
+
+        # Area and bounding box of each polygon in self.polygons
+        # {(p1,p2,...pn) : FaceMetrics, ...}
+        self.polygonMetrics = {}
+
+        # Polygons of the background frame (see add_frame)
+        self.background = set()
+
+        # Total area of the polygons in self.polygons w/o background (overlapping polygons are counted twice)
+        self.polygonArea = 0
+
+        # Grid of canvas cells to the stored polygons whose bounding box covers them.
+        # Used to find the polygon under a peck
+        self.faceGrid = FaceGrid()
+
+        # Maps subdivision face ids to their polygon in self.polygons, so the polygon
+        # can be replaced when a new line splits the face
+        self.facePolygons = {}
+
+        # Polygons stored and removed since the last call to add_segment, add_segments, flush or remove_segment
+        # {(p1,p2,...pn) : id, ...}
+        self.newFaces, self.removedFaces = {}, {}
+
+        # First line and first point queued by queue_segments whose edges and faces
+        # haven't been updated yet (None if there are none)
+        self.pendingLine, self.pendingPoint = None, None
+
+    # Return true if line segments AB and CD intersect.
+    # This will be used in the findIntersects method
+    def hasIntersect(self, A, B, C, D):
+        def ccw(A,B,C):
+            return (C[1]-A[1]) * (B[0]-A[0]) > (B[1]-A[1]) * (C[0]-A[0])
+        return ccw(A,C,D) != ccw(B,C,D) and ccw(A,B,C) != ccw(A,B,D)
+
+    # Every time a line segment is drawn, we will call this function on that line segment
+    # For each line that the new line intersects, we will append the intersect coord (x, y) to
+    # the values (lists) of both lines in self.intersects
+    # Return all intersects between line and all stored lines as a list of 2D points
+    # candidates are the stored lines to check, if they are already known (see add_segments)
+    def findIntersects(self, line, candidates=None):
+        # helper function to find intersection between 2 lines
+        def getIntersect(line1, line2):
+
+            xdiff = (line1[0][0] - line1[1][0], line2[0][0] - line2[1][0])
+            ydiff = (line1[0][1] - line1[1][1], line2[0][1] - line2[1][1])
+
+            def det(a, b):
+                return a[0] * b[1] - a[1] * b[0]
+
+            div = det(xdiff, ydiff)
+            if div == 0:
+                return None
+
+            d = (det(*line1), det(*line2))
+            x = det(d, xdiff) / div
+            y = det(d, ydiff) / div
+            return (x, y)
+
+        # only check stored lines that share a grid cell with line, unless
+        # we want to verify against the old loop through all stored lines
+        if self.exhaustive: candidates = list(self.lines.keys())
+        elif candidates is None: candidates = self.lineGrid.candidates(line)
+
+        # check intersect between line and each candidate line l2
+        # with NumPy, all candidates are checked at once in self.lineStore
+        if self.lineStore is not None:
+            hits = self.lineStore.intersects(line, candidates)
+        else:
+            hits = []
+            for lineNum in candidates:
+                l2 = self.lines[lineNum]
+                if self.hasIntersect(line[0], line[1], l2[0], l2[1]) == False:
+                    continue
+                hits.append((lineNum, getIntersect(line, l2)))
+
+        self.newIncidences = {} # {point : [line0, ...]} stored lines that got a point from this line
+        for lineNum, p in hits:
+            if p is None: continue # if line and l2 not intersecting
+
+            # reuse the point at p, if lines already cross there (in snap-rounding
+            # mode, a point within snapTolerance of p)
+            point = self.pointGrid.nearest(p) if self.pointGrid is not None else self.vertices.find(p)
+            if point is not None:
+                p = self.vertices[point]
+                self.lineToPoints[(lineNum, self.currLineIndex)] = point
+                for l, l2 in ((lineNum, self.lines[lineNum]), (self.currLineIndex, line)):
+                    if l in self.pointToLineIndices[point]: continue
+                    self.pointToLineIndices[point].append(l)
+                    self.insertIntersect(l, l2, p, point)
+                    if l != self.currLineIndex: self.newIncidences.setdefault(point, []).append(l)
+                continue
+
+            point = self.vertices.add(p)
+            self.lineToPoints[(lineNum, self.currLineIndex)] = point
+            if self.pointGrid is not None: self.pointGrid.insert(point, p)
+
+            # add indices of intersecting lines (values) associated with point (key) to the pointToLineIndices dict
+            self.pointToLineIndices[point] = [self.currLineIndex, lineNum]
+
+            # update self.intersects dict, keeping each list sorted along its line
+            self.insertIntersect(lineNum, self.lines[lineNum], p, point)
+            self.insertIntersect(self.currLineIndex, line, p, point)
+            self.newIncidences[point] = [lineNum]
+
+    # Insert point p (vertex id ind) into the intersects of lineNum. Points are kept
+    # sorted by their parameter t along the line (0 at line[0], 1 at line[1]), found
+    # with a binary search over self.intersectParams instead of re-sorting the list
+    def insertIntersect(self, lineNum, line, p, ind):
+        (x1, y1), (x2, y2) = line
+        dx, dy = x2 - x1, y2 - y1
+        t = ((p[0]-x1) * dx + (p[1]-y1) * dy) / (dx*dx + dy*dy)
+
+        params = self.intersectParams.setdefault(lineNum, [])
+        i = bisect(params, t)
+        params.insert(i, t)
+        self.intersects.setdefault(lineNum, []).insert(i, ind)
+
+    # Function to update the edges and self.graph after a new line (lineNum) is drawn.
+    # Only the new line and the lines it crossed got new points, so only their edges are
+    # rebuilt, plus the edges of any line through a point that joined or left self.toExclude.
+    # touched are the lines whose points changed, if they are not the lines through lineNum's points.
+    # Only the whole-graph solver reads self.graph (incremental engines find faces with
+    # self.subdivision), so incremental engines don't keep the edges at all
+    def updateEdges(self, lineNum, touched=None):
+        if self.incremental: return
+        if touched is None:
+            touched = {lineNum}
+            for p in self.intersects.get(lineNum, []):
+                touched.update(self.pointToLineIndices[p])
+
+        # identify all points that are not involved in a cycle. A point is excluded
+        # if it is the only point of intersection on one of its lines
+        for l in list(touched):
+            for p in self.intersects.get(l, []):
+                isExcluded = any(len(self.intersects[k]) == 1 for k in self.pointToLineIndices[p])
+                if isExcluded == (p in self.toExclude): continue
+                if isExcluded: self.toExclude.add(p)
+                else: self.toExclude.remove(p)
+                touched.update(self.pointToLineIndices[p])
+
+        # only the edges line l gained or lost go to updateCore. Most of the edges of a touched
+        # line are the same as before, and would otherwise leave and rejoin the core
+        removed, added = [], []
+        for l in touched:
+            _list = self.intersects.get(l, [])
+            edges = [(u, v) for u, v in zip(_list, _list[1:])
+                     if (u not in self.toExclude) and (v not in self.toExclude)]
+            old = set(self.lineEdges.pop(l, []))
+            if edges: self.lineEdges[l] = edges
+            new = set(edges)
+            removed.extend(e for e in old if e not in new)
+            added.extend(e for e in edges if e not in old)
+        self.updateCore(removed, added)
+
+    # Function to update self.adjacency, self.core and self.graph after edges were removed and added.
+    # Removing edges can only shrink the core, so only the ends of removed edges are pruned again.
+    # Adding edges can only grow it, and only with points joined to an added edge by points outside
+    # the core, so those are put back in the core and pruned again. Every other point keeps its place.
+    # An edge only leaves self.graph when the last line that has it is removed, and only joins it
+    # when the first one is added
+    def updateCore(self, removed, added):
+        for u, v in removed:
+            for a, b in ((u, v), (v, u)):
+                self.adjacency[a][b] -= 1
+                if not self.adjacency[a][b]: del self.adjacency[a][b]
+                if not self.adjacency[a]: del self.adjacency[a]
+            if v in self.adjacency.get(u, ()): continue # another line still has the edge
+            if u in self.core and v in self.core: self.unlinkCore(u, v)
+        for u, v in added:
+            isNew = v not in self.adjacency.get(u, ())
+            for a, b in ((u, v), (v, u)):
+                neighbors = self.adjacency.setdefault(a, {})
+                neighbors[b] = neighbors.get(b, 0) + 1
+            if isNew and u in self.core and v in self.core: self.graph.setdefault(u, []).append(v)
+        self.pruneCore([p for edge in removed for p in edge])
+
+        # points outside the core joined to an added edge
+        grown, stack = set(), [p for edge in added for p in edge if p not in self.core]
+        while stack:
+            p = stack.pop()
+            if p in grown: continue
+            grown.add(p)
+            stack.extend(q for q in self.adjacency.get(p, ()) if q not in self.core)
+        for p in grown:
+            self.core.add(p)
+            for q in self.adjacency.get(p, ()):
+                if q != p and q in self.core: self.graph.setdefault(p, []).append(q)
+        self.pruneCore(grown)
+
+    # remove points with fewer than 2 edges in the core from it, starting with points,
+    # then the points that were joined to them
+    def pruneCore(self, points):
+        stack = list(points)
+        while stack:
+            p = stack.pop()
+            if p not in self.core: continue
+            neighbors = self.adjacency.get(p, ())
+            if sum(q in self.core for q in neighbors) >= 2: continue
+            self.core.remove(p)
+            for q in neighbors:
+                if q in self.core: self.unlinkCore(p, q)
+            stack.extend(neighbors)
+
+    # remove the edge between core points u and v from self.graph, which has it as u->v or v->u
+    def unlinkCore(self, u, v):
+        if v not in self.graph.get(u, ()): u, v = v, u
+        self.graph[u].remove(v)
+        if not self.graph[u]: del self.graph[u]
+
+    # edges between the points of intersection as (u, v) pairs, e.g. to draw them. These are the
+    # edges of self.graph, or of self.subdivision in incremental engines, which don't keep self.graph
+    def edges(self):
+        if self.incremental:
+            return [(u, v) for u, neighbors in self.subdivision.rotation.items() for v in neighbors if u < v]
+        return [(u, v) for u, neighbors in self.graph.items() for v in neighbors]
+
+    # True if points u and v are next to each other on a line that passes through both
+    def isEdge(self, u, v):
+        for l in set(self.pointToLineIndices[u]) & set(self.pointToLineIndices[v]):
+            inds = self.intersects[l]
+            i = inds.index(u)
+            if (i > 0 and inds[i-1] == v) or (i+1 < len(inds) and inds[i+1] == v): return True
+        return False
+
+    # Function to add the points of a newly drawn line to self.subdivision.
+    # Each new point splits the edge it lands on along the line it crosses (in snap-rounding
+    # mode, an existing point can land on more lines), and the new line adds an edge between
+    # each pair of its consecutive points.
+    # Returns the faces created and destroyed by the new line
+    def updateFaces(self, lineNum):
+        newPoints = self.intersects.get(lineNum, [])
+        for p in newPoints:
+            self.subdivision.addVertex(p, self.vertices[p])
+
+        for p in newPoints:
+            for l in self.newIncidences.get(p, []):
+                # neighbors of p along the stored line l that now passes through p
+                _list = self.intersects[l]
+                i = _list.index(p)
+                prev = _list[i-1] if i > 0 else None
+                next = _list[i+1] if i+1 < len(_list) else None
+                if prev is not None and next is not None:
+                    self.subdivision.splitEdge(prev, next, p)
+                    # snapped lines can overlap, keep the edge if another line still has it
+                    if self.pointGrid is not None and self.isEdge(prev, next):
+                        self.subdivision.addEdge(prev, next)
+                elif prev is not None:
+                    self.subdivision.addEdge(prev, p)
+                elif next is not None:
+                    self.subdivision.addEdge(p, next)
+
+        for i in range(len(newPoints)-1):
+            self.subdivision.addEdge(newPoints[i], newPoints[i+1])
+
+        return self.subdivision.update()
+
+    # convert a region (list of point indices) to a polygon (tuple of vertex ids)
+    def toPolygon(self, r):
+        polygon, coord = list(r), self.vertices.__getitem__
+
+        # reorder polygon vertices while preserving edge relationships
+        # we want the top-left-most vertex as the first item
+        forwardList = polygon + polygon
+        left = forwardList.index(min(polygon, key=coord))
+        if coord(forwardList[left])[0] > coord(forwardList[left + 1])[0]:
+            forwardList.reverse()
+            left = forwardList.index(min(polygon, key=coord))
+        return tuple(forwardList[left:left+len(polygon)])
+
+    # (x, y) vertices of a polygon, e.g. to draw it
+    def polygonCoords(self, polygon):
+        return self.vertices.coords(polygon)
+
+    # add polygon and its face id to self.polygons and its indexes
+    def storePolygon(self, polygon, id):
+        self.polygons[polygon] = id
+        for v in polygon:
+            self.vertexToPolygons.setdefault(v, set()).add(polygon)
+        metrics = self.polygonMetrics[polygon] = FaceMetrics(self.polygonCoords(polygon))
+        if polygon not in self.background: self.polygonArea += abs(metrics.area)
+        self.faceGrid.insert(polygon, metrics.box)
+        self.newFaces[polygon] = id
+
+    # remove polygon from self.polygons and its indexes. Returns its face id
+    def unstorePolygon(self, polygon):
+        for v in polygon:
+            self.vertexToPolygons[v].discard(polygon)
+            if not self.vertexToPolygons[v]: del self.vertexToPolygons[v]
+        self.faceGrid.remove(polygon)
+        metrics = self.polygonMetrics.pop(polygon)
+        if polygon not in self.background: self.polygonArea -= abs(metrics.area)
+        id = self.polygons.pop(polygon)
+        if self.newFaces.pop(polygon, None) is None: self.removedFaces[polygon] = id
+        return id
+
+    # polygon at (x, y). Polygons can overlap, and the one created last (the highest id)
+    # is shown on top. Returns None if no polygon is there
+    def topPolygonAt(self, x, y):
+        polygons = self.faceGrid.locate((x, y), self.polygonCoords)
+        return max(polygons, key=self.polygons.get) if polygons else None
+
+    # face id of the polygon at (x, y) (see topPolygonAt). Returns None if no polygon is there
+    def polygonAt(self, x, y):
+        polygon = self.topPolygonAt(x, y)
+        return None if polygon is None else self.polygons[polygon]
+
+    # Function to replace the polygons of faces destroyed by a new line (from updateFaces),
+    # called once the created faces have been filled. The face id (and so the canvas item and
+    # color) of a destroyed face moves to one of its child faces that was not filled, such as the
+    # same face with a new vertex on its border. If no child can take it (all were filled, or none
+    # is a region or has the old vertices on its border), it is removed
+    def replacePolygons(self, created, destroyed, parents):
+        children = {}
+        for child, parent in parents.items():
+            children.setdefault(parent, []).append(child)
+
+        for faceId in destroyed:
+            polygon = self.facePolygons.pop(faceId, None)
+            if polygon is None: continue
+            id = self.unstorePolygon(polygon)
+
+            for child in sorted(children.get(faceId, [])):
+                if child in self.facePolygons: continue # already filled
+
+                # child isn't a region (e.g. a line dangles into the face), keep the polygon as is,
+                # if its vertices are still on the child's border. Removing a line can merge the
+                # face into the exterior face, which isn't a region either and doesn't have them
+                if child not in created:
+                    if not set(polygon) <= set(self.subdivision.faces[child]): continue
+                    self.storePolygon(polygon, id)
+                    self.facePolygons[child] = polygon
+                    break
+
+                # move the face id to the child's vertices
+                newPolygon = self.toPolygon(created[child])
+                if newPolygon in self.polygons: continue
+                self.storePolygon(newPolygon, id)
+                self.facePolygons[child] = newPolygon
+                break
+
+    # function to find all new polygons since last shape drawn
+    # regions are the faces created by the last line (from updateFaces). If not
+    # given, all faces are found again by solving the whole graph
+    # returns the polygons that were filled
+    def findNewPolygons(self, regions=None):
+        def printPolygon(p, end='\n'):
+            for point in p:
+                print(point, end=' ')
+            print(end=end)
+
+        if regions is None:
+            # if graph contains only 1 directed edge, there are no polygons
+            if len(self.graph) <= 1:
+                return []
+
+            if np is not None and self.faceExecutor is None:
+                # hand the solver arrays, so steps 1-4 run vectorized
+                coords = (np.array(self.vertices.xs), np.array(self.vertices.ys))
+                g = Graph(toCSR(self.graph, len(self.vertices)), coords)
+            else:
+                g = Graph(self.graph, self.vertices) # passing in directed graph
+            regions = g.solve(self.faceExecutor) # list of sublists containing point indices (0 - n)
+
+        # for each polygon
+        # (in the order of regions, so faces get their ids in the same order every run)
+        polygons = dict.fromkeys(self.toPolygon(r) for r in regions)
+
+        newPolygons = [p for p in polygons if p not in self.polygons]
+        stored = []
+
+        # if polygon is new
+        for polygon in newPolygons:
+            isNew = True
+            # if polygon is already in stored polygons, don't add it again
+            # a stored polygon has the same vertices, or all vertices of one are vertices of the other,
+            # when the number of vertices they share is the vertex count of either of them
+            # (a region never repeats a vertex, and a vertex id is never repeated at one coordinate)
+            polygonSet = frozenset(polygon)
+            shared = {}
+            for v in polygonSet:
+                for curr in self.vertexToPolygons.get(v, ()):
+                    shared[curr] = shared.get(curr, 0) + 1
+            for curr, n in shared.items():
+                if n == len(polygonSet) or n == len(curr):
+                    isNew = False
+                    break
+
+            # if new polygon, give it a new face id and add it to the polygons dict
+            if isNew:
+                self.storePolygon(polygon, self.nextPolygonId) # add new polygon to list
+                self.nextPolygonId += 1
+                stored.append(polygon)
+        # print("polygons:")
+        # for p in self.polygons:
+        #     printPolygon(p, end=' | ')
+
+        return stored
+
+    # faces stored and removed since the last call, as ({polygon : id}, {polygon : id}).
+    # A face id in both moved to new vertices. A polygon removed and stored again
+    # with the same id didn't change and is left out
+    def faceChanges(self):
+        newFaces, removedFaces = self.newFaces, self.removedFaces
+        for polygon, id in list(newFaces.items()):
+            if removedFaces.get(polygon) == id: del newFaces[polygon], removedFaces[polygon]
+        self.newFaces, self.removedFaces = {}, {}
+        return newFaces, removedFaces
+
+    # function to extend line by a factor of d.
+    # this is useful for intersection detection
+    def extendLine(self, line, d):
+        p1, p2 = line[0], line[1]
+        mag = ((p2[0]-p1[0])**2 + (p2[1]-p1[1])**2) ** (1/2) # magnitude
+
+        if mag != 0:
+            # new coords
+            x1 = p1[0] - d * (p2[0]-p1[0]) / mag
+            y1 = p1[1] - d * (p2[1]-p1[1]) / mag
+            x2 = p2[0] + d * (p2[0]-p1[0]) / mag
+            y2 = p2[1] + d * (p2[1]-p1[1]) / mag
+        else:
+            # new coords
+            x1 = p1[0] - d * (p2[0]-p1[0])
+            y1 = p1[1] - d * (p2[1]-p1[1])
+            x2 = p2[0] + d * (p2[0]-p1[0])
+            y2 = p2[1] + d * (p2[1]-p1[1])
+
+        return [(x1, y1), (x2, y2)]
+
+    # key of a sorted line (as pecked, not extended) used to find lines that were already drawn
+    # endpoints are rounded to multiples of duplicateTolerance, so nearly equal lines share a key
+    def lineKey(self, line):
+        return tuple(round(c / self.duplicateTolerance) for point in line for c in point)
+
+    # True if line (or one within duplicateTolerance of it) was already drawn
+    def isDrawn(self, line):
+        return self.lineKey(sorted(line)) in self.lineKeys
+
+    # draw line [(x1, y1), (x2, y2)] and update the points of intersection and faces.
+    # Returns the faces the line added and removed, as ({polygon : id}, {polygon : id}) (see faceChanges).
+    # A line that was already drawn (see isDrawn) is left out and changes nothing
+    def add_segment(self, line):
+        self.addLine(line)
+        return self.faceChanges()
+
+    # add_segment without collecting the faces it changed
+    def addLine(self, line):
+        key = self.lineKey(sorted(line))
+        if key in self.lineKeys: return
+        self.updatePending()
+        self.lineKeys[key] = self.currLineIndex
+        self.lineToKey[self.currLineIndex] = key
+
+        # in snap-rounding mode, move endpoints within snapTolerance of a point onto it
+        if self.pointGrid is not None:
+            line = list(line)
+            for i, end in enumerate(line):
+                point = self.pointGrid.nearest(end)
+                if point is not None: line[i] = self.vertices[point]
+
+        # increase line length slightly
+        line = self.extendLine(line, 3)
+
+        # sort line endpoints
+        line = sorted(line)
+
+        # find intersects between new line and all existing lines
+        self.findIntersects(line)
+
+        # add new line to lines dict
+        self.lines[self.currLineIndex] = line
+        self.lineGrid.insert(self.currLineIndex, line)
+        if self.lineStore is not None: self.lineStore.append(line)
+
+        # increment current line number
+        self.currLineIndex += 1
+        if not self.findFaces: return
+
+        # update edges
+        self.updateEdges(self.currLineIndex - 1)
+
+        # find all polygons
+        if self.incremental:
+            created, destroyed, parents = self.updateFaces(self.currLineIndex - 1)
+            faces = {self.toPolygon(r): faceId for faceId, r in created.items()}
+            for polygon in self.findNewPolygons(list(created.values())):
+                self.facePolygons[faces[polygon]] = polygon
+            self.replacePolygons(created, destroyed, parents)
+        else:
+            self.findNewPolygons()
+
+    # draw many lines at once, e.g. the border of the canvas.
+    # Gives the same lines, points and polygons as calling add_segment on each line in order,
+    # but edges and faces are only updated once for the whole batch.
+    # Lines of the batch are paired up with a sweep line (see line_sweep.py) and stored
+    # lines are found with self.lineGrid, so each line is only checked against lines near it
+    # Returns the faces the batch added and removed (see add_segment)
+    def add_segments(self, lines):
+        self.queue_segments(lines)
+        return self.flush()
+
+    # draw the lines of a background frame, e.g. the border of the canvas, with add_segments.
+    # The faces the frame fills are the background: later lines inside them never split or
+    # replace their polygons, and their area is left out of polygonArea.
+    # Returns the faces the frame added and removed (see add_segment)
+    def add_frame(self, lines):
+        newFaces, removedFaces = self.add_segments(lines)
+        for faceId in [f for f, polygon in self.facePolygons.items() if polygon in newFaces]:
+            del self.facePolygons[faceId]
+        for polygon in newFaces:
+            self.background.add(polygon)
+            self.polygonArea -= abs(self.polygonMetrics[polygon].area)
+        return newFaces, removedFaces
+
+    # add_segments for one line
+    def queue_segment(self, line):
+        self.queue_segments([line])
+
+    # add lines to the engine, but leave updating edges and faces to flush(), so lines added
+    # in quick succession are updated together. Queued lines are stored and get their intersects
+    # right away, so isDrawn and later lines see them. Everything else that changes or saves
+    # the engine (add_segment, remove_segment, snapshot) updates the queued lines first
+    def queue_segments(self, lines):
+        # in snap-rounding mode each line snaps onto the points of the lines before it,
+        # and without faces there is nothing to update once
+        if self.pointGrid is not None or not self.findFaces:
+            for line in lines: self.addLine(line)
+            return
+
+        # Step 1: drop lines that were already drawn, then extend and sort the rest (as in add_segment)
+        batch = []
+        for line in lines:
+            key = self.lineKey(sorted(line))
+            if key in self.lineKeys: continue
+            self.lineKeys[key] = self.currLineIndex + len(batch)
+            self.lineToKey[self.currLineIndex + len(batch)] = key
+            batch.append(sorted(self.extendLine(line, 3)))
+        if not batch: return
+
+        # Step 2: find intersects. Each line is checked against the stored lines near it
+        # and the lines before it in the batch that the sweep line paired it with
+        firstLine, firstPoint = self.currLineIndex, len(self.vertices)
+        pairs = sweepPairs(batch)
+        for i, line in enumerate(batch):
+            self.findIntersects(line, self.lineGrid.candidates(line) + [firstLine + j for j in pairs[i]])
+            self.lines[self.currLineIndex] = line
+            if self.lineStore is not None: self.lineStore.append(line)
+            self.currLineIndex += 1
+        for i, line in enumerate(batch):
+            self.lineGrid.insert(firstLine + i, line)
+        if self.pendingLine is None:
+            self.pendingLine, self.pendingPoint = firstLine, firstPoint
+
+    # update edges and faces for the lines queued since the last update
+    # Returns the faces that changed since faceChanges was last called (see add_segment)
+    def flush(self):
+        self.updatePending()
+        return self.faceChanges()
+
+    # flush without collecting the faces that changed
+    def updatePending(self):
+        if self.pendingLine is None: return
+        firstLine, firstPoint = self.pendingLine, self.pendingPoint
+        self.pendingLine = self.pendingPoint = None
+
+        # Step 3: update edges of the new lines and every line they crossed
+        touched = set(range(firstLine, self.currLineIndex))
+        for l in range(firstLine, self.currLineIndex):
+            for p in self.intersects.get(l, []):
+                touched.update(self.pointToLineIndices[p])
+        self.updateEdges(firstLine, touched)
+
+        # Step 4: find all polygons
+        if self.incremental:
+            for l in range(firstLine, self.currLineIndex):
+                for p in self.intersects.get(l, []):
+                    self.subdivision.addVertex(p, self.vertices[p])
+
+            for l in touched:
+                _list = self.intersects.get(l, [])
+                if l >= firstLine: # new line, join its consecutive points
+                    for i in range(len(_list)-1):
+                        self.subdivision.addEdge(_list[i], _list[i+1])
+                    continue
+
+                # stored line, each new point splits the edge between the points on either side
+                # of it. Points after it are only joined once the sweep along the line reaches them
+                next = None
+                nexts = [None] * len(_list) # first stored point after each point
+                for i in range(len(_list)-1, -1, -1):
+                    nexts[i] = next
+                    if _list[i] < firstPoint: next = _list[i]
+                for i, p in enumerate(_list):
+                    if p < firstPoint: continue
+                    prev = _list[i-1] if i > 0 else None
+                    if prev is not None and nexts[i] is not None:
+                        self.subdivision.splitEdge(prev, nexts[i], p)
+                    elif prev is not None:
+                        self.subdivision.addEdge(prev, p)
+                    elif nexts[i] is not None:
+                        self.subdivision.addEdge(p, nexts[i])
+
+            created, destroyed, parents = self.subdivision.update()
+            faces = {self.toPolygon(r): faceId for faceId, r in created.items()}
+            for polygon in self.findNewPolygons(list(created.values())):
+                self.facePolygons[faces[polygon]] = polygon
+            self.replacePolygons(created, destroyed, parents)
+        else:
+            self.findNewPolygons()
+
+    # Function to remove a line (and its points of intersection).
+    # The faces on either side of the line are merged, and only the lines it crossed,
+    # their edges and the faces around them are updated
+    # Returns the faces the removal added and removed (see add_segment). Only incremental engines
+    # merge faces: without the subdivision, the polygons of the faces the line closed off are kept
+    def remove_segment(self, lineNum):
+        self.updatePending()
+        line, points = self.lines.pop(lineNum), self.intersects.pop(lineNum, [])
+        self.intersectParams.pop(lineNum, None)
+        del self.lineKeys[self.lineToKey.pop(lineNum)]
+        self.lineGrid.remove(lineNum, line)
+        if self.lineStore is not None: self.lineStore.remove(lineNum)
+
+        # Step 1: remove the edges along the line
+        touched = {lineNum}
+        for p in points:
+            self.pointToLineIndices[p].remove(lineNum)
+            for l in self.pointToLineIndices[p]:
+                self.lineToPoints.pop((l, lineNum), None)
+                self.lineToPoints.pop((lineNum, l), None)
+                touched.add(l)
+        for i in range(len(points)-1):
+            u, v = points[i], points[i+1]
+            # snapped lines can overlap, keep the edge if another line still has it
+            if self.incremental and u != v and v in self.subdivision.rotation[u] and not self.isEdge(u, v):
+                self.subdivision.removeEdge(u, v)
+
+        # Step 2: points that were only on one other line aren't points of intersection anymore.
+        # Remove them from that line and join their neighbors along it
+        for p in points:
+            lines = self.pointToLineIndices[p]
+            if len(lines) > 1: continue
+            for l in lines:
+                _list = self.intersects[l]
+                i = _list.index(p)
+                del _list[i], self.intersectParams[l][i]
+                if self.incremental and 0 < i < len(_list):
+                    self.subdivision.addEdge(_list[i-1], _list[i])
+            if self.incremental: self.subdivision.removeVertex(p)
+            self.vertices.remove(p)
+            if self.pointGrid is not None: self.pointGrid.remove(p, self.vertices[p])
+            del self.pointToLineIndices[p]
+            self.toExclude.discard(p)
+
+        # Step 3: update edges, then merge faces. Each merged face keeps the face id
+        # of one of the faces it replaces
+        self.updateEdges(lineNum, touched)
+        if self.incremental:
+            created, destroyed, parents = self.subdivision.update()
+            self.replacePolygons(created, destroyed, parents)
+            created = {f: r for f, r in created.items() if f not in self.facePolygons}
+            faces = {self.toPolygon(r): faceId for faceId, r in created.items()}
+            for polygon in self.findNewPolygons(list(created.values())):
+                self.facePolygons[faces[polygon]] = polygon
+        else:
+            self.findNewPolygons()
+        return self.faceChanges()
+
+    # state of the engine (lines, points of intersection, faces and polygons) to pickle.
+    # Everything that can be rebuilt from it, like self.graph and the spatial indexes, is left out
+    def snapshot(self):
+        self.updatePending()
+        sub = self.subdivision
+        return {
+            "lines": self.lines,
+            "lineKeys": self.lineKeys,
+            "currLineIndex": self.currLineIndex,
+            "vertices": (self.vertices.xs, self.vertices.ys),
+            "intersects": self.intersects,
+            "intersectParams": self.intersectParams,
+            "lineToPoints": self.lineToPoints,
+            "pointToLineIndices": self.pointToLineIndices,
+            "subdivision": (sub.coords, sub.rotation, sub.faceOf, sub.faces, sub.nextFaceId),
+            "polygons": self.polygons,
+            "nextPolygonId": self.nextPolygonId,
+            "facePolygons": self.facePolygons,
+            "background": self.background,
+            }
+
+    # restore the state saved by snapshot() into an empty engine
+    def restore(self, snapshot):
+        self.lines = snapshot["lines"]
+        self.lineKeys = snapshot["lineKeys"]
+        self.lineToKey = {lineNum: key for key, lineNum in self.lineKeys.items()}
+        self.currLineIndex = snapshot["currLineIndex"]
+        self.intersects = snapshot["intersects"]
+        self.intersectParams = snapshot["intersectParams"]
+        self.lineToPoints = snapshot["lineToPoints"]
+        self.pointToLineIndices = snapshot["pointToLineIndices"]
+        self.nextPolygonId = snapshot["nextPolygonId"]
+        self.facePolygons = snapshot["facePolygons"]
+        self.background = snapshot.get("background", set()) # not in snapshots saved before it was kept
+        (self.subdivision.coords, self.subdivision.rotation, self.subdivision.faceOf,
+         self.subdivision.faces, self.subdivision.nextFaceId) = snapshot["subdivision"]
+
+        # rebuild the vertex ids of the points of intersection and the indexes over lines and points
+        self.vertices.xs, self.vertices.ys = snapshot["vertices"]
+        self.vertices.ids = {self.vertices[i]: i for i in self.pointToLineIndices}
+        if self.pointGrid is not None:
+            for i in self.pointToLineIndices: self.pointGrid.insert(i, self.vertices[i])
+        for lineNum in range(self.currLineIndex):
+            line = self.lines.get(lineNum)
+            if line is not None:
+                self.lineGrid.insert(lineNum, line)
+                if self.lineStore is not None: self.lineStore.append(line)
+            elif self.lineStore is not None: # removed line, keep the rows in line with the line numbers
+                self.lineStore.append([(0, 0), (0, 0)])
+                self.lineStore.remove(lineNum)
+
+        # rebuild the graph from the points on each line, and the polygons with their indexes
+        self.updateEdges(None, set(self.lines))
+        for polygon, id in snapshot["polygons"].items():
+            self.storePolygon(polygon, id)
+        self.newFaces = {}
+
+    # shut down the worker processes, if any
+    def close(self):
+        if self.faceExecutor is not None: self.faceExecutor.shutdown()
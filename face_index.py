@@ -0,0 +1,53 @@
+from math import floor
+
+# Uniform grid over the bounding boxes of all stored polygons (faces) on the canvas.
+# Polygons can be any hashable key, e.g. a tuple of vertex ids; locate is given their vertices.
+# Used by Paint to find the polygon under a peck without testing every polygon: only the
+# polygons whose bounding box covers the peck's grid cell get an exact point-in-polygon test.
+
+class FaceGrid:
+    def __init__(self, cellSize=64):
+        self.cellSize = cellSize
+        self.cells = {} # {(cx, cy) : {polygon0, polygon3, ...}}
+        self.boxes = {} # {polygon : (xmin, ymin, xmax, ymax)}
+
+    # all grid cells (cx, cy) that the box (xmin, ymin, xmax, ymax) covers
+    def cellsInBox(self, box):
+        s = self.cellSize
+        return [(cx, cy) for cx in range(floor(box[0] / s), floor(box[2] / s) + 1)
+                         for cy in range(floor(box[1] / s), floor(box[3] / s) + 1)]
+
+    # add polygon to every cell its bounding box (xmin, ymin, xmax, ymax) covers
+    def insert(self, polygon, box):
+        self.boxes[polygon] = box
+        for cell in self.cellsInBox(box):
+            self.cells.setdefault(cell, set()).add(polygon)
+
+    def remove(self, polygon):
+        for cell in self.cellsInBox(self.boxes.pop(polygon)):
+            self.cells[cell].discard(polygon)
+            if not self.cells[cell]: del self.cells[cell]
+
+    # True if coord is inside the polygon with (x, y) vertices polygon (ray casting to the right of coord)
+    def contains(self, polygon, coord):
+        x, y = coord
+        inside = False
+        for i in range(len(polygon)):
+            (x1, y1), (x2, y2) = polygon[i-1], polygon[i]
+            if (y1 > y) != (y2 > y) and x < x1 + (x2-x1) * (y-y1) / (y2-y1):
+                inside = not inside
+        return inside
+
+    # return all stored polygons that contain coord
+    # coordsOf(polygon) gives the (x, y) vertices of a stored polygon
+    def locate(self, coord, coordsOf):
+        cell = (floor(coord[0] / self.cellSize), floor(coord[1] / self.cellSize))
+        return [p for p in self.cells.get(cell, ()) if self.contains(coordsOf(p), coord)]
+
+    # return all stored polygons whose bounding box overlaps the box (xmin, ymin, xmax, ymax)
+    def inBox(self, box):
+        found = set()
+        for cell in self.cellsInBox(box):
+            found.update(self.cells.get(cell, ()))
+        return [p for p in found if self.boxes[p][0] <= box[2] and box[0] <= self.boxes[p][2]
+                                and self.boxes[p][1] <= box[3] and box[1] <= self.boxes[p][3]]
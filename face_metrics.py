@@ -0,0 +1,19 @@
+# Geometry of a face (polygon) on the canvas, computed once when the polygon is stored
+# so data logging and analysis can read it without going back over the vertices.
+
+# signed area of a vertex cycle [(x0, y0), (x1, y1), ...] (shoelace formula)
+# the sign gives the direction the cycle goes around. Faces traced by Graph and
+# PlanarSubdivision all go around one way, and the exterior face of each connected
+# part of the drawing goes around the other way
+def signedArea(coords):
+    area = 0
+    for i in range(len(coords)):
+        (x1, y1), (x2, y2) = coords[i-1], coords[i]
+        area += x1 * y2 - x2 * y1
+    return area / 2
+
+class FaceMetrics:
+    def __init__(self, polygon):
+        xs, ys = [x for x, _ in polygon], [y for _, y in polygon]
+        self.area = signedArea(polygon) # signed, in the order the vertices are stored
+        self.box = (min(xs), min(ys), max(xs), max(ys)) # (xmin, ymin, xmax, ymax)
@@ -1,91 +1,254 @@
-from math import atan2, pi
-
 # Based on an algorithm developed by X.Y. Jiang and H. Bunke (1993) in An Optimal Algorithm for Extracting the Regions of a Plane Graph
 # Implemented by Paul Gan
 
+from face_metrics import signedArea
+from itertools import chain
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+# Components of the graph with fewer edges than this are solved in-process by Graph.solve,
+# even if it is given a process pool. Sending a small component to a worker costs more than solving it
+PARALLEL_MIN_EDGES = 2000
+
+# solve one component in a worker process
+# adjacency is {i0 : [i1, i2...]} of vertex ids and coords is {i0 : (x, y)}
+# returns the component's regions as lists of vertex ids
+def solveComponent(adjacency, coords):
+    return Graph(adjacency, coords).solve()
+
+# compressed sparse row form of graph g {i0 : [i1, i2...]} with vertex ids below n
+# returns NumPy arrays (offsets, neighbors): the neighbors of vertex i are
+# neighbors[offsets[i]:offsets[i+1]], in the order g lists them. Requires NumPy
+def toCSR(g, n):
+    ids = np.fromiter(g.keys(), dtype=np.intp, count=len(g))
+    counts = np.fromiter(map(len, g.values()), dtype=np.intp, count=len(g))
+    neighbors = np.fromiter(chain.from_iterable(g.values()), dtype=np.intp, count=int(counts.sum()))
+    owners = np.repeat(ids, counts)
+    offsets = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(np.bincount(owners, minlength=n), out=offsets[1:])
+    return offsets, neighbors[np.argsort(owners, kind="stable")]
+
 class Graph:
-    def __init__(self, g):
-        self.graph = g # undirected graph of Point objects {Point_0 : [point_1, Point_2...]}
+    # g is {v0 : [v1, v2...]} and coords gives the (x, y) of each vertex id, coords[vi]
+    # (a dict or a VertexTable). Or g is a CSR adjacency (offsets, neighbors) (see toCSR) and
+    # coords is (xs, ys), NumPy arrays of the coordinates of every vertex id. The graph is
+    # then solved by vectorized passes over the arrays (see buildRegionsCSR), and no Python
+    # object is made per edge or wedge
+    def __init__(self, g, coords):
+        self.csr = isinstance(g, tuple)
+        self.graph = g # undirected graph of vertex ids {v0 : [v1, v2...]}, or (offsets, neighbors)
         # sorted by vi as primary key and theta as secondary key
         self.vertexAngles = [] # [((vi, vj), theta), ...]
         self.wedges = []
+        self.successors = {} # {(vi, vj) : wedge (vi, vj, vk)}
+        self.coords = coords
         self.regions = []
 
-    # find angle of line formed by 2 Point objects with respect to the horizontal
-    # P1 will be the point of the angle
+    # find a pseudo-angle of line formed by 2 vertices with respect to the horizontal
+    # P1 will be the point of the angle. This is the "diamond angle" in [0, 4): it is not
+    # the angle in degrees, but it sorts edges in exactly the same order as atan2 would,
+    # without any trigonometry
     def findAngle(self, P1, P2):
-        y = P1.coord[1] - P2.coord[1]
-        x = P2.coord[0] - P1.coord[0]
+        (x1, y1), (x2, y2) = self.coords[P1], self.coords[P2]
+        y = y1 - y2
+        x = x2 - x1
         if y == 0 and x == 0: return 0
-        res = atan2(y, x) * 180 / pi
-        return res if res >= 0 else (360+res)
-
-    # helper function to get all ind values of Point objs in a wedge
-    # returns a tuple (i1, i2, i3)
-    def wedgeToIndices(self, wedge):
-        return (wedge[0].ind, wedge[1].ind, wedge[2].ind)
+        if y >= 0:
+            return y / (x+y) if x >= 0 else 1 - x / (y-x)
+        else:
+            return 2 - y / (-x-y) if x < 0 else 3 + x / (x-y)
 
-    # binary search algorithm for finding next wedge from sorted wedge list
-    # using v1 and v2 as primary and secondary search keys
+    # find the wedge (v1, v2, vn) that follows a wedge ending in (v1, v2)
+    # using the successor map built in buildWedges, so each step is an O(1) lookup
     def searchWedge(self, v1, v2):
-        l, r = 0, len(self.wedges)
-        while l < r:
-            m = (l+r) // 2
-            # if middle element is what we are looking for, return the wedge
-            if self.wedges[m][0].ind == v1 and self.wedges[m][1].ind == v2:
-                return self.wedges[m]
-            # else if middle element > v1, shrink right bound
-            elif self.wedges[m][0].ind > v1: r = m
-            # else if middle element < v1, shrink left bound
-            elif self.wedges[m][0].ind < v1: l = m
-            # else v1 matches but v2 doesn't, we adjust bound based on v2
-            else:
-                if self.wedges[m][1].ind > v2: r = m
-                else: l = m
-        
-        # if we reach here -> element not found, return None
-        return None
+        return self.successors.get((v1, v2))
 
     def buildVertexAngles(self):
-        for vi, edges in self.graph.items():
-            for vj in edges:
+        edges, keys = [], []
+        for vi, neighbors in self.graph.items():
+            for vj in neighbors:
                 # Step 1: duplicate each undirected edge to form two directed edges
-                e1, e2 = (vi, vj), (vj, vi)
-
-                # Step 2: Complement each directed edge w/ angle theta of (vi, vj) 
-                # w/ respect to horizontal line passing through vi. Add to list
-                self.vertexAngles.extend([(e1, self.findAngle(e1[0], e1[1])), 
-                                          (e2, self.findAngle(e2[0], e2[1]))])
+                for e in ((vi, vj), (vj, vi)):
+                    # Step 2: Complement each directed edge w/ angle theta of (vi, vj)
+                    # w/ respect to horizontal line passing through vi. Add to list
+                    keys.append((e[0], self.findAngle(e[0], e[1]), e[1], len(edges)))
+                    edges.append(e)
 
         # Step 3: Sort list ascending by index and theta as primary and secondary keys
-        self.vertexAngles = sorted(self.vertexAngles, 
-                            key=lambda x: (x[0][0].ind, x[1]))
+        # Edges at the same angle (to points that nearly coincide) are ordered by vj, so
+        # the wedges don't depend on the order the graph lists its edges in
+        keys.sort()
+        self.vertexAngles = [(edges[k], theta) for _, theta, _, k in keys]
 
     def buildWedges(self):
         # Step 4: Combine consecutive entries in each group into a wedge
+        # start at 0, so a first group with a single entry (a vertex of degree 1) still gets its wedge
         firstInd = 0
-        for i in range(1, len(self.vertexAngles)):
-            if self.vertexAngles[i][0][0].ind == self.vertexAngles[i-1][0][0].ind:
+        for i in range(len(self.vertexAngles)):
+            if i > 0 and self.vertexAngles[i][0][0] == self.vertexAngles[i-1][0][0]:
                 tup = (self.vertexAngles[i][0][1], self.vertexAngles[i][0][0], self.vertexAngles[i-1][0][1])
                 self.wedges.append(tup)
 
             # last entry in group, add wedge
-            if (i+1 >= len(self.vertexAngles)) or (self.vertexAngles[i+1][0][0].ind != self.vertexAngles[i][0][0].ind):
+            if (i+1 >= len(self.vertexAngles)) or (self.vertexAngles[i+1][0][0] != self.vertexAngles[i][0][0]):
                 tup = (self.vertexAngles[firstInd][0][1], self.vertexAngles[i][0][0], self.vertexAngles[i][0][1])
                 # tup = (self.vertexAngles[i][0][1], self.vertexAngles[i][0][0], self.vertexAngles[firstInd][0][1])
                 self.wedges.append(tup)
                 firstInd = i + 1
 
+        # map the first two vertices of each wedge to the wedge, so the wedge that
+        # continues a face from (v1, v2) can be looked up directly
+        # Each directed edge starts one wedge, unless the graph has an edge more than once.
+        # Then some wedges have no successor, and buildRegions could never close their face
+        self.successors = {}
+        for w in self.wedges:
+            if (w[0], w[1]) in self.successors:
+                raise ValueError("edge (%s, %s) is in the graph more than once" % (w[0], w[1]))
+            self.successors[(w[0], w[1])] = w
+
+    # Steps 1-3 for a CSR graph, as vectorized passes
+    # returns arrays src, dst of the directed edges sorted as vertexAngles is,
+    # and twin, the position of the reverse of each edge in that order
+    def sortEdgesCSR(self):
+        offsets, neighbors = self.graph
+        xs, ys = self.coords
+
+        # Step 1: duplicate each undirected edge. Edge m (vi, vj) is entry 2m and
+        # (vj, vi) entry 2m+1, the order buildVertexAngles adds them in
+        owners = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        src = np.empty(2 * len(neighbors), dtype=np.intp)
+        dst = np.empty(2 * len(neighbors), dtype=np.intp)
+        src[0::2], src[1::2] = owners, neighbors
+        dst[0::2], dst[1::2] = neighbors, owners
+
+        # Step 2: theta of every directed edge, findAngle for all of them at once.
+        # Each division is only kept where findAngle would do it, so its divisor is > 0
+        y = ys[src] - ys[dst]
+        x = xs[dst] - xs[src]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            theta = np.where(y >= 0, np.where(x >= 0, y / (x+y), 1 - x / (y-x)),
+                             np.where(x < 0, 2 - y / (-x-y), 3 + x / (x-y)))
+        theta[(x == 0) & (y == 0)] = 0
+
+        # as in buildWedges, an edge that is in the graph more than once would leave
+        # wedges without a successor, so the faces would not be cycles of edges
+        pairs = np.lexsort((dst, src))
+        repeats = (src[pairs][1:] == src[pairs][:-1]) & (dst[pairs][1:] == dst[pairs][:-1])
+        if repeats.any():
+            m = pairs[1:][repeats][0]
+            raise ValueError("edge (%s, %s) is in the graph more than once" % (src[m], dst[m]))
+
+        # Step 3: sort by vi and theta, ties by vj as in buildVertexAngles
+        order = np.lexsort((dst, theta, src))
+        position = np.empty_like(order)
+        position[order] = np.arange(len(order))
+        return src[order], dst[order], position[order ^ 1]
+
+    # Steps 4-8 for a CSR graph, with no loop over wedges or regions (except the few faces
+    # that pass through a vertex more than once, see walkFaceCSR).
+    # The wedge that enters vi along edge (vj, vi) leaves it along the entry before (vi, vj)
+    # in vi's group (the last entry, for the first), so following wedges is a permutation of
+    # the directed edges and every face is one of its cycles. The cycles are found together
+    # by pointer jumping, which takes O(log n) passes over the edges for faces of n edges
+    def buildRegionsCSR(self):
+        src, dst, twin = self.sortEdgesCSR()
+        n = len(src)
+        if n == 0: return
+
+        # Step 4: the edge each edge is followed by in its face
+        starts = np.flatnonzero(np.r_[True, src[1:] != src[:-1]])
+        before = np.arange(n) - 1
+        before[starts] = np.r_[starts[1:], n] - 1
+        succ = before[twin]
+
+        # Steps 5 and 7: label each face with the smallest rank by (vi, vj) of its edges,
+        # so faces start at, and come out in the order of, the wedge buildRegions would start them at
+        rank = np.empty(n, dtype=np.intp)
+        rank[np.lexsort((dst, src))] = np.arange(n)
+        label, jump = rank, succ
+        while True:
+            joined = np.minimum(label, label[jump])
+            if np.array_equal(joined, label): break
+            label, jump = joined, jump[jump]
+
+        # Step 8: the position of each edge in its face, as its distance to the
+        # last edge (the one before the start)
+        isLast = rank[succ] == label
+        dist = (~isLast).astype(np.intp)
+        jump = np.where(isLast, np.arange(n), succ)
+        while not np.array_equal(jump[jump], jump):
+            dist, jump = dist + dist[jump], jump[jump]
+
+        # the region of a face is the vertex each of its edges leads to. Keep faces of more than
+        # 2 vertices, none of them repeated, that aren't exterior faces (signed area > 0)
+        order = np.lexsort((-dist, label))
+        vertices, label = dst[order], label[order]
+        bounds = np.flatnonzero(np.r_[True, label[1:] != label[:-1], True])
+        faces = label[bounds[:-1]]
+        pairs = np.lexsort((vertices, label))
+        repeats = (vertices[pairs][1:] == vertices[pairs][:-1]) & (label[pairs][1:] == label[pairs][:-1])
+        repeated = np.bincount(label[pairs][1:][repeats], minlength=n)[faces] > 0
+        xs, ys = self.coords
+        area = np.bincount(label, weights=xs[src[order]] * ys[vertices] - xs[vertices] * ys[src[order]], minlength=n)
+        keep = (np.diff(bounds) > 2) & ~repeated & (area[faces] <= 0)
+
+        vertices, bounds, faces = vertices.tolist(), bounds.tolist(), faces.tolist()
+        regions = [(faces[i], vertices[bounds[i]:bounds[i+1]]) for i in np.flatnonzero(keep).tolist()]
+
+        # a face through a vertex more than once is split into regions the way buildRegions
+        # splits it, and all regions are put in the order buildRegions finds them in
+        if repeated.any():
+            for i in np.flatnonzero(repeated).tolist():
+                regions.extend(self.walkFaceCSR(order[bounds[i]:bounds[i+1]], src, dst, rank))
+            regions.sort(key=lambda r: r[0])
+        self.regions.extend(region for _, region in regions)
+
+    # regions of one face of a CSR graph that passes through a vertex more than once, found as
+    # buildRegions finds them. edges are the face's edges in order. A walk starts at the unused edge
+    # of smallest rank (v1, v2), and stops before an edge that leaves v1 or leads to v2, so it can
+    # close a loop before it gets back to its first edge. The edges left over start the next walk.
+    # Returns (rank of the first edge, region) of each region kept, as buildRegionsCSR keeps them
+    def walkFaceCSR(self, edges, src, dst, rank):
+        edges = edges.tolist()
+        tails, heads, ranks = src[edges].tolist(), dst[edges].tolist(), rank[edges].tolist()
+        xs, ys = self.coords
+        k = len(edges)
+        used = [False] * k
+        regions = []
+        for i0 in sorted(range(k), key=ranks.__getitem__):
+            if used[i0]: continue
+            used[i0] = True
+            v1, v2 = tails[i0], heads[i0]
+            region, i = [v2], i0
+            while True:
+                i = (i+1) % k
+                used[i] = True
+                region.append(heads[i])
+                next = (i+1) % k
+                if tails[next] == v1 or heads[next] == v2: break
+            if len(region) > 2 and len(region) == len(set(region)) and \
+               signedArea([(xs[v], ys[v]) for v in region]) <= 0:
+                regions.append((ranks[i0], region))
+        return regions
+
     # this will return all faces of our planar graph
     def buildRegions(self):
+        # wedges are only ever marked used, so the first unused wedge can never be before
+        # the last one we returned. Moving a cursor forward through the sorted wedge list
+        # gives the same wedge as rescanning self.used from the start, but visits each
+        # wedge once in total instead of once per region
+        cursor = 0
         def findUnused():
-            for k, v in self.used.items():
-                if v == 0:
-                    return k
-            return None
+            nonlocal cursor
+            while cursor < len(self.wedges) and self.used[self.wedges[cursor]]:
+                cursor += 1
+            return self.wedges[cursor] if cursor < len(self.wedges) else None
 
         # Step 5: Sort wedge list using vi and vj as primary and secondary key
-        self.wedges = sorted(self.wedges, key=lambda x: (x[0].ind, x[1].ind))
+        self.wedges = sorted(self.wedges, key=lambda x: (x[0], x[1]))
 
         # Step 6: Mark all wedges as unused
         self.used = {w:0 for w in self.wedges}
@@ -93,24 +256,27 @@ class Graph:
         # Step 7: Find unused wedge W0 = (v1, v2, v3)
         w0 = findUnused() # initial wedge: w0
         self.used[w0] = 1 # set w0 to used
-        ind0 = self.wedgeToIndices(w0)
+        ind0 = w0
         nextFirst, nextSecond = ind0[1], ind0[2]
         wedgeList = [ind0]
 
         # Step 8: Search for next wedge wi = (v2, v3, vn)
         while self.used:
-            wi = self.searchWedge(nextFirst, nextSecond) # O(logn) binary search
+            wi = self.searchWedge(nextFirst, nextSecond) # O(1) successor lookup
+            if wi is None:
+                raise ValueError("no wedge follows edge (%s, %s)" % (nextFirst, nextSecond))
             self.used[wi] = 1 # set wi to used
-            ind = self.wedgeToIndices(wi)
-            nextFirst, nextSecond = ind[1], ind[2]
-            wedgeList.append(self.wedgeToIndices(wi))
+            nextFirst, nextSecond = wi[1], wi[2]
+            wedgeList.append(wi)
 
             # keep searching for next wedge until w(i+1) and w(1) are contiguous
             if (nextFirst != ind0[0]) and (nextSecond != ind0[1]): continue
             else: # contiguous region found
                 region = [x[1] for x in wedgeList]
-                # if region contains no repeating elements
-                if len(region) > 2 and len(region) == len(set(region)): 
+                # if region contains no repeating elements and isn't an exterior face
+                # (exterior faces go around the other way, so their signed area is positive)
+                if len(region) > 2 and len(region) == len(set(region)) and \
+                   signedArea([self.coords[i] for i in region]) <= 0:
 
                     # _ = [print(x) for x in wedgeList]
                     # print()
@@ -123,20 +289,54 @@ class Graph:
                 w0 = findUnused() # initial wedge: w0
                 if not w0: break
                 self.used[w0] = 1 # set w0 to used
-                ind0 = self.wedgeToIndices(w0)
+                ind0 = w0
                 nextFirst, nextSecond = ind0[1], ind0[2]
                 wedgeList.append(ind0)
-        
-        # remove exterior face from our regions. (remove the longest list)
-        # toRemove, longest = None, 0
-        # for r in self.regions:
-        #     if len(r) > longest:
-        #         longest = len(r)
-        #         toRemove = r
-        # self.regions.remove(toRemove)
+
+    # split the graph into its connected components
+    # returns a list of graphs in the same form as self.graph
+    def components(self):
+        # union-find over vertex ids
+        parent = {}
+        def find(i):
+            while parent.setdefault(i, i) != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+        for vi, neighbors in self.graph.items():
+            for vj in neighbors:
+                parent[find(vi)] = find(vj)
+
+        components = {}
+        for vi, neighbors in self.graph.items():
+            components.setdefault(find(vi), {})[vi] = neighbors
+        return list(components.values())
 
     # this function sequentially calls all functions in our pipeline
-    def solve(self):
+    # with a process pool (concurrent.futures executor), each connected component with at least
+    # PARALLEL_MIN_EDGES edges is solved in a worker. A face never spans two components, so the
+    # regions are the same as solving the whole graph, though they may come out in another order.
+    # A CSR graph is always solved in-process
+    def solve(self, executor=None):
+        if executor is not None and not self.csr:
+            futures = []
+            for g in self.components():
+                if sum(len(neighbors) for neighbors in g.values()) < PARALLEL_MIN_EDGES:
+                    self.regions.extend(Graph(g, self.coords).solve())
+                    continue
+                # workers only get the coords of the component's vertices
+                coords = {}
+                for vi, neighbors in g.items():
+                    for v in [vi] + neighbors: coords[v] = self.coords[v]
+                futures.append(executor.submit(solveComponent, g, coords))
+            for future in futures:
+                self.regions.extend(future.result())
+            return self.regions
+
+        if self.csr:
+            self.buildRegionsCSR()
+            return self.regions
+
         self.buildVertexAngles()
         self.buildWedges()
         self.buildRegions()
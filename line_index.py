@@ -0,0 +1,51 @@
+from math import floor
+
+# Uniform grid spatial index over all lines drawn on the canvas.
+# Used by Paint.findIntersects so that a new line is only checked against the
+# lines that share at least one grid cell with it, instead of every stored line.
+
+class LineGrid:
+    def __init__(self, cellSize=64):
+        self.cellSize = cellSize
+        self.cells = {} # {(cx, cy) : [line0, line3, ...]}
+        self.eps = 1e-6 # padding so points on a cell border land in both cells
+
+    # find all grid cells (cx, cy) that the segment passes through
+    # we walk column by column and clip the segment to each column of cells
+    def cellsOnLine(self, line):
+        (x1, y1), (x2, y2) = line
+        if x1 > x2: x1, y1, x2, y2 = x2, y2, x1, y1
+        s, eps = self.cellSize, self.eps
+
+        cells = []
+        for cx in range(floor((x1-eps) / s), floor((x2+eps) / s) + 1):
+            # y values of the segment where it enters and leaves this column
+            if x2 - x1 <= eps:
+                ya, yb = y1, y2
+            else:
+                lo, hi = max(x1, cx*s), min(x2, (cx+1)*s)
+                ya = y1 + (y2-y1) * (lo-x1) / (x2-x1)
+                yb = y1 + (y2-y1) * (hi-x1) / (x2-x1)
+            if ya > yb: ya, yb = yb, ya
+            for cy in range(floor((ya-eps) / s), floor((yb+eps) / s) + 1):
+                cells.append((cx, cy))
+        return cells
+
+    # add line (already sorted [(x1, y1), (x2, y2)]) to every cell it passes through
+    def insert(self, lineNum, line):
+        for cell in self.cellsOnLine(line):
+            self.cells.setdefault(cell, []).append(lineNum)
+
+    # remove line (as it was inserted) from every cell it passes through
+    def remove(self, lineNum, line):
+        for cell in self.cellsOnLine(line):
+            self.cells[cell].remove(lineNum)
+            if not self.cells[cell]: del self.cells[cell]
+
+    # return indices of all stored lines that share a cell with line
+    # sorted ascending so they come out in the same order as self.lines
+    def candidates(self, line):
+        found = set()
+        for cell in self.cellsOnLine(line):
+            found.update(self.cells.get(cell, ()))
+        return sorted(found)
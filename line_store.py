@@ -0,0 +1,58 @@
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+# Struct-of-arrays copy of every line drawn on the canvas.
+# Row i of self.buffer holds (x1, y1, x2, y2) of line i, so Paint.findIntersects can test a
+# new line against many stored lines in one vectorized call instead of one Python call per line.
+# Requires NumPy. Paint falls back to its pure Python loop if NumPy is not installed.
+
+class LineStore:
+    def __init__(self, capacity=64):
+        self.buffer = np.empty((capacity, 4), dtype=np.float64) # [[x1, y1, x2, y2], ...]
+        self.count = 0 # number of rows in use
+
+    # add line [(x1, y1), (x2, y2)] as row self.count, doubling the buffer when it is full
+    def append(self, line):
+        if self.count == len(self.buffer):
+            grown = np.empty((2 * len(self.buffer), 4), dtype=np.float64)
+            grown[:self.count] = self.buffer[:self.count]
+            self.buffer = grown
+        (x1, y1), (x2, y2) = line
+        self.buffer[self.count] = (x1, y1, x2, y2)
+        self.count += 1
+
+    # rows are never reused, so a removed line is set to NaN, which intersects nothing
+    def remove(self, row):
+        self.buffer[row] = np.nan
+
+    # find intersects between line and the stored lines in rows (all rows if None)
+    # the arithmetic is the same as Paint.hasIntersect and getIntersect, one operation at
+    # a time, so the points come out bit for bit equal to the pure Python loop
+    # returns [(row, (x, y)), ...] in the order of rows
+    def intersects(self, line, rows=None):
+        if rows is None: rows = np.arange(self.count)
+        else: rows = np.asarray(rows, dtype=np.intp)
+        if len(rows) == 0: return []
+
+        (ax, ay), (bx, by) = line
+        cx, cy, dx, dy = self.buffer[rows].T
+
+        # Step 1: orientation tests, the same as hasIntersect(A, B, C, D)
+        def ccw(px, py, qx, qy, rx, ry):
+            return (ry-py) * (qx-px) > (qy-py) * (rx-px)
+        hit = ((ccw(ax, ay, cx, cy, dx, dy) != ccw(bx, by, cx, cy, dx, dy)) &
+               (ccw(ax, ay, bx, by, cx, cy) != ccw(ax, ay, bx, by, dx, dy)))
+
+        # Step 2: intersection points of the lines that passed, the same as getIntersect
+        rows, cx, cy, dx, dy = rows[hit], cx[hit], cy[hit], dx[hit], dy[hit]
+        xdiff0, xdiff1 = ax - bx, cx - dx
+        ydiff0, ydiff1 = ay - by, cy - dy
+        div = xdiff0 * ydiff1 - xdiff1 * ydiff0
+        ok = div != 0
+        d0, d1 = ax * by - ay * bx, cx[ok] * dy[ok] - cy[ok] * dx[ok]
+        xs = (d0 * xdiff1[ok] - d1 * xdiff0) / div[ok]
+        ys = (d0 * ydiff1[ok] - d1 * ydiff0) / div[ok]
+
+        return [(row, (x, y)) for row, x, y in zip(rows[ok].tolist(), xs.tolist(), ys.tolist())]
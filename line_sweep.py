@@ -0,0 +1,32 @@
+from heapq import heappush, heappop
+
+# Sweep-line pass over a batch of lines, used by Paint.drawLines_many.
+# A vertical line sweeps left to right over the batch. Lines are added to the active set at
+# their left endpoint and dropped at their right endpoint, so a line is only paired with the
+# lines whose x range overlaps it (and whose y range overlaps too), not with the whole batch.
+
+# lines are sorted [(x1, y1), (x2, y2)] with x1 <= x2 (as in Paint.lines)
+# returns {i : [j0, j1, ...]} the earlier lines j < i of the batch that line i may intersect,
+# sorted ascending so they come out in the same order as the lines were given
+def sweepPairs(lines):
+    events = sorted(range(len(lines)), key=lambda i: lines[i][0][0])
+    active, ends = {}, [] # {i : (ymin, ymax)} lines the sweep line is crossing, heap of (x2, i)
+    pairs = {i: [] for i in range(len(lines))}
+
+    for i in events:
+        (x1, y1), (x2, y2) = lines[i]
+        # drop lines that end before line i starts
+        while ends and ends[0][0] < x1:
+            del active[heappop(ends)[1]]
+
+        ymin, ymax = min(y1, y2), max(y1, y2)
+        for j, (ylo, yhi) in active.items():
+            if ylo <= ymax and ymin <= yhi:
+                if j < i: pairs[i].append(j)
+                else: pairs[j].append(i)
+
+        active[i] = (ymin, ymax)
+        heappush(ends, (x2, i))
+
+    for i in pairs: pairs[i].sort()
+    return pairs
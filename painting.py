@@ -0,0 +1,148 @@
+import pickle
+from os import path, replace
+
+# Painting of one subject, shared by Paint in polygon_fill.py and P033d, with no Tk in it.
+# Wraps the FaceEngine (and the RasterFaces in raster mode) with what both programs keep around
+# it: the lines whose faces haven't been found yet (see FACE_DEBOUNCE), the data rows logged in
+# the meantime, and the snapshot file the painting is saved to between sessions.
+# Paint adds lines here, and only draws the faces that resolve() returns, e.g.
+#
+#   painting.addLine(line)
+#   newFaces, removedFaces = painting.resolve()
+
+class Painting:
+    # engine: FaceEngine of the painting
+    # rasterFaces: RasterFaces that finds the regions instead of the engine (None to fill faces of the graph)
+    def __init__(self, engine, rasterFaces=None):
+        self.engine = engine
+        self.rasterFaces = rasterFaces
+
+        # Lines added since the last call to resolve, whose faces haven't been found yet
+        self.pendingLines = []
+
+        # Data rows logged while lines were pending, the number of lines the engine had added by then,
+        # and the values to fill in when their faces are found
+        # [(row, lineCount, {column : function}), ...]
+        self.pendingRows = []
+
+    # True if lines are waiting for resolve() to find their faces
+    def isPending(self):
+        return bool(self.pendingLines)
+
+    # add line [(x1, y1), (x2, y2)] to the painting. Its faces are found by the next resolve().
+    # Returns False if line (or one within the engine's duplicateTolerance of it) was already drawn
+    def addLine(self, line):
+        if self.engine.isDrawn(line): return False
+        self.engine.queue_segment(line)
+        self.pendingLines.append(self.engine.currLineIndex - 1)
+        return True
+
+    # add many lines at once (see FaceEngine.add_segments). Their faces are found by the next resolve().
+    # Returns the number of lines that were already drawn
+    def addLines(self, lines):
+        firstLine = self.engine.currLineIndex
+        self.engine.queue_segments(lines)
+        self.pendingLines.extend(range(firstLine, self.engine.currLineIndex))
+        return len(lines) - (self.engine.currLineIndex - firstLine)
+
+    # add the border of the canvas, whose faces are the background (see FaceEngine.add_frame).
+    # Returns the faces that changed (see resolve)
+    def addFrame(self, lines):
+        if self.rasterFaces is not None:
+            self.addLines(lines)
+            return self.resolve()
+        # add_frame also finds the faces of pending lines, and returns them with the frame's
+        self.pendingLines = []
+        return self.engine.add_frame(lines)
+
+    # find the faces of the lines added since the last call.
+    # Returns the faces that changed, as ({polygon : id}, {polygon : id}) (see FaceEngine.add_segment),
+    # or in raster mode, the numbers of the lines to add to self.rasterFaces (in order, each one's
+    # regions painted before the next is added)
+    def resolve(self):
+        lines, self.pendingLines = self.pendingLines, []
+        if self.rasterFaces is not None:
+            return lines
+        return self.engine.flush()
+
+    # log a data row whose values in some columns depend on faces that may not have been found yet.
+    # values is {column : function}. While lines are pending, the columns are "pending" and the
+    # functions are called by fillRows, once the faces are found (and drawn). Otherwise they are called now
+    def logRow(self, row, values):
+        for column, value in values.items():
+            row[column] = "pending" if self.isPending() else value()
+        if self.isPending(): self.pendingRows.append((row, self.engine.currLineIndex, values))
+
+    # fill in the columns logRow left pending, after resolve(), of the rows logged before line
+    # number lineCount was added (all rows if None). In raster mode, the regions are found one line
+    # at a time, so rows can be filled as they were when logged, e.g. before a peck became the
+    # end of the next line
+    def fillRows(self, lineCount=None):
+        rows = []
+        for row, rowLineCount, values in self.pendingRows:
+            if lineCount is not None and rowLineCount > lineCount:
+                rows.append((row, rowLineCount, values))
+                continue
+            for column, value in values.items():
+                row[column] = value()
+        self.pendingRows = rows
+
+    # the last line drawn, if it can be removed (None if not). The border lines can't be removed,
+    # lines can't be removed from the pixel mask in raster mode, and engines that solve the whole
+    # graph can't merge the faces the line closed off
+    def lastRemovableLine(self):
+        lineNum = next(reversed(self.engine.lines))
+        if lineNum < 4 or self.rasterFaces is not None or not self.engine.incremental: return None
+        return lineNum
+
+    # number of polygons (regions in raster mode) w/o background
+    def polygonCount(self):
+        if self.rasterFaces is not None:
+            return len(self.rasterFaces.areas) - 1
+        return len(self.engine.polygons) - 1
+
+    # total area of the polygons (number of pixels of the regions in raster mode) w/o background.
+    # The regions of the pixel mask cover it all, and the largest one is taken as the background
+    def polygonArea(self):
+        if self.rasterFaces is not None:
+            areas = self.rasterFaces.areas.values()
+            return sum(areas) - max(areas)
+        return self.engine.polygonArea
+
+    # area of the polygon at (x, y) (number of pixels of the region there in raster mode).
+    # Returns None if there is none
+    def faceAreaAt(self, x, y):
+        if self.rasterFaces is not None:
+            label = self.rasterFaces.regionAt(x, y)
+            return None if label is None else self.rasterFaces.areas[label]
+        polygon = self.engine.topPolygonAt(x, y)
+        return None if polygon is None else abs(self.engine.polygonMetrics[polygon].area)
+
+    # face id of the polygon at (x, y) (see FaceEngine.polygonAt), or in raster mode the label
+    # of the region there. Returns None if there is none
+    def faceAt(self, x, y):
+        if self.rasterFaces is not None:
+            return self.rasterFaces.regionAt(x, y)
+        return self.engine.polygonAt(x, y)
+
+    # save the painting (the engine's lines, points of intersection and faces) to file,
+    # with the items of extra (e.g. the color of each polygon), so it can be continued next session.
+    # Pending lines are saved without their faces, so resolve (and draw) them first.
+    # The pixel mask isn't saved, so raster mode saves nothing
+    def save(self, file, extra):
+        if self.rasterFaces is not None: return
+        snapshot = self.engine.snapshot()
+        snapshot.update(extra)
+        # write to a temporary file first, so a crash while saving can't corrupt the last snapshot
+        with open(file + ".tmp", "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(file + ".tmp", file)
+
+    # load the painting saved by save() into the (empty) engine.
+    # Returns the snapshot, with the items of extra, or None if there is none
+    def load(self, file):
+        if self.rasterFaces is not None or not path.exists(file): return None
+        with open(file, "rb") as f:
+            snapshot = pickle.load(f)
+        self.engine.restore(snapshot)
+        return snapshot
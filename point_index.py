@@ -0,0 +1,33 @@
+from math import floor
+
+# Spatial hash over all points of intersection on the canvas.
+# Used by Paint in snap-rounding mode (SNAP_TOLERANCE > 0) to find an existing point
+# within the tolerance of a new intersection or stroke endpoint, so they share one vertex.
+
+class PointGrid:
+    def __init__(self, cellSize):
+        self.cellSize = cellSize # also the largest distance at which a point is found
+        self.cells = {} # {(cx, cy) : [(point0, (x, y)), ...]}
+
+    def cellOf(self, coord):
+        return (floor(coord[0] / self.cellSize), floor(coord[1] / self.cellSize))
+
+    def insert(self, point, coord):
+        self.cells.setdefault(self.cellOf(coord), []).append((point, coord))
+
+    def remove(self, point, coord):
+        cell = self.cellOf(coord)
+        self.cells[cell].remove((point, coord))
+        if not self.cells[cell]: del self.cells[cell]
+
+    # return the stored point closest to coord if it is within cellSize, else None
+    # any such point is in the cell of coord or one of its 8 neighbors
+    def nearest(self, coord):
+        cx, cy = self.cellOf(coord)
+        best, bestDist = None, self.cellSize ** 2
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for point, (x, y) in self.cells.get((cx+dx, cy+dy), ()):
+                    dist = (x-coord[0])**2 + (y-coord[1])**2
+                    if dist <= bestDist: best, bestDist = point, dist
+        return best
@@ -0,0 +1,149 @@
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+# Raster alternative to finding faces with Graph / PlanarSubdivision (see RASTER_FACES).
+# Lines are drawn into a canvas-sized pixel mask, and every 4-connected area of pixels
+# not on a line is a region. A new line can only split the regions it passes through,
+# so only the pixels of those regions (inside their bounding box) are labelled again.
+# The mask reaches margin pixels past each side of the canvas, out to the border lines Paint
+# draws around it, so lines that end just outside the canvas don't close off a region
+# against the edge of the canvas.
+# Requires NumPy.
+
+class RasterFaces:
+    def __init__(self, width, height, margin):
+        self.width, self.height, self.margin = width, height, margin
+        h, w = height + 2*margin, width + 2*margin
+        self.labels = np.ones((h, w), dtype=np.int32) # region of each pixel, 0 on a line
+        self.areas = {1: w * h} # {label : number of pixels}
+        self.boxes = {1: (0, h, 0, w)} # {label : (y0, y1, x0, x1)} bounding box, end exclusive
+        self.nextLabel = 2
+
+    # pixels (ys, xs) of the mask on line [(x1, y1), (x2, y2)] (in canvas coords).
+    # Steps are at most one pixel in x and y, so the pixels are 8-connected and no
+    # 4-connected region can leak through the line
+    def pixelsOnLine(self, line):
+        (x1, y1), (x2, y2) = line
+        h, w = self.labels.shape
+        n = int(max(abs(x2-x1), abs(y2-y1))) + 2
+        xs = np.rint(np.linspace(x1, x2, n)).astype(np.intp) + self.margin
+        ys = np.rint(np.linspace(y1, y2, n)).astype(np.intp) + self.margin
+        inside = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+        pixels = np.unique(ys[inside] * w + xs[inside]) # each pixel once
+        return pixels // w, pixels % w
+
+    # horizontal runs of True pixels in each row of mask
+    # returns arrays rows, starts, ends (end exclusive) sorted by row then start
+    def runs(self, mask):
+        padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask
+        edges = np.diff(padded, axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        return rows, starts, ends
+
+    # label the 4-connected components of mask
+    # returns (rows, starts, ends, component) of every run, component numbered from 0
+    def components(self, mask):
+        rows, starts, ends = self.runs(mask)
+
+        # Step 1: pairs (a, b) of runs in consecutive rows that share a column. Keys put every
+        # run in one sorted order, so the runs of row r-1 that overlap run b of row r are
+        # found for all b at once: they end after b starts and start before b ends
+        width = mask.shape[1] + 1
+        startKeys, endKeys = rows * width + starts, rows * width + ends
+        lo = np.searchsorted(endKeys, (rows-1) * width + starts, side="right")
+        hi = np.searchsorted(startKeys, (rows-1) * width + ends, side="left")
+        counts = np.maximum(hi - lo, 0)
+        b = np.repeat(np.arange(len(rows)), counts)
+        a = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        # Step 2: join the runs of each pair. Every pass hooks the larger label of each pair
+        # onto the smaller one, then follows labels to their root, until no label changes
+        label = np.arange(len(rows))
+        while True:
+            la, lb = label[a], label[b]
+            np.minimum.at(label, np.maximum(la, lb), np.minimum(la, lb))
+            while True:
+                jumped = label[label]
+                if np.array_equal(jumped, label): break
+                label = jumped
+            if np.array_equal(label[a], label[b]): break
+
+        _, component = np.unique(label, return_inverse=True)
+        return rows, starts, ends, component
+
+    # draw line into the mask and label the regions it split again
+    # returns ({label : [(row, start, end), ...]} runs of each created region in canvas coords,
+    # {label : parent label} the region each created region was cut from,
+    # {label0, label1, ...} regions that no longer exist)
+    def addLine(self, line):
+        ys, xs = self.pixelsOnLine(line)
+        onLine = self.labels[ys, xs]
+        crossed, counts = np.unique(onLine[onLine > 0], return_counts=True)
+        crossed = crossed.tolist()
+        for label, n in zip(crossed, counts.tolist()):
+            self.areas[label] -= n
+        self.labels[ys, xs] = 0
+        if not crossed: return {}, {}, set()
+
+        # only the pixels of the crossed regions can change label
+        y0 = min(self.boxes[l][0] for l in crossed)
+        y1 = max(self.boxes[l][1] for l in crossed)
+        x0 = min(self.boxes[l][2] for l in crossed)
+        x1 = max(self.boxes[l][3] for l in crossed)
+        box = self.labels[y0:y1, x0:x1]
+        isCrossed = np.zeros(self.nextLabel, dtype=bool)
+        isCrossed[crossed] = True
+        rows, starts, ends, component = self.components(isCrossed[box])
+
+        # the region of each component. A region the line didn't split is one component
+        # and keeps its label, every component of a split region gets a new label
+        parent = np.zeros(component.max() + 1, dtype=np.intp)
+        parent[component] = box[rows, starts]
+        split = np.bincount(parent, minlength=self.nextLabel)[parent] > 1
+        newLabel = np.cumsum(split) - 1 + self.nextLabel
+        self.nextLabel += int(split.sum())
+
+        # write the new labels, one pixel per run element
+        runs = np.nonzero(split[component])[0]
+        lengths = ends[runs] - starts[runs]
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        box[np.repeat(rows[runs], lengths), np.repeat(starts[runs], lengths) + offsets] = \
+            np.repeat(newLabel[component[runs]], lengths)
+
+        # runs of each created region, and its area and bounding box
+        created, parents, removed = {}, {}, set()
+        m = self.margin
+        r, c = rows[runs] + y0, component[runs]
+        s, e = starts[runs] + x0, ends[runs] + x0
+        order = np.argsort(c, kind="stable") # keeps the runs of a region in row order
+        r, s, e, c = r[order], s[order], e[order], c[order]
+        first = np.flatnonzero(np.r_[len(c) > 0, c[1:] != c[:-1]])
+        last = np.r_[first[1:], len(c)]
+        areas = np.add.reduceat(e - s, first).tolist() if len(c) else []
+        x0s = np.minimum.reduceat(s, first).tolist() if len(c) else []
+        x1s = np.maximum.reduceat(e, first).tolist() if len(c) else []
+        runsByRegion = np.stack((r - m, s - m, e - m), axis=1).tolist()
+        for k, (i, j) in enumerate(zip(first.tolist(), last.tolist())):
+            label = int(newLabel[c[i]])
+            created[label], parents[label] = runsByRegion[i:j], int(parent[c[i]])
+            self.areas[label] = areas[k]
+            self.boxes[label] = (int(r[i]), int(r[j-1]) + 1, x0s[k], x1s[k])
+        for label in set(parents.values()):
+            del self.areas[label], self.boxes[label]
+            removed.add(label)
+
+        # regions that were crossed and lost all their pixels
+        for label in crossed:
+            if label in self.areas and self.areas[label] == 0:
+                del self.areas[label], self.boxes[label]
+                removed.add(label)
+        return created, parents, removed
+
+    # label of the region at (x, y) on the canvas, or None on a line or outside the canvas
+    def regionAt(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height): return None
+        return int(self.labels[int(y) + self.margin, int(x) + self.margin]) or None
@@ -0,0 +1,146 @@
+from math import atan2
+from face_metrics import signedArea
+
+# Incremental planar subdivision (a doubly-connected edge list kept as a rotation system).
+# Every undirected edge u-v is stored as two half-edges (u, v) and (v, u). The neighbors of
+# each vertex are kept sorted by angle, so the half-edge that follows (u, v) around a face is
+# (v, w), where w is the neighbor of v just before u in that order.
+#
+# Graph.solve() rebuilds every face of the graph after each stroke. Here only the faces that
+# touch a vertex whose neighbors changed are destroyed and traced again, so the cost of a
+# stroke depends on the faces it crosses rather than on the whole painting.
+
+class PlanarSubdivision:
+    def __init__(self):
+        self.coords = {} # {vertex : (x, y)}
+        self.rotation = {} # {vertex : [neighbor0, neighbor1, ...]} sorted by angle
+        self.faceOf = {} # {(u, v) : faceId} face to the side of each half-edge
+        self.faces = {} # {faceId : (v0, v1, ... vn)} vertex cycle of each face
+        self.nextFaceId = 0
+
+        self.dirty = set() # vertices whose neighbors changed since the last update()
+        self.staleFaces = set() # faces that lost a half-edge since the last update()
+        self.splitFaces = {} # {(u, w) : faceId} face of the half-edge that (u, w) was split from
+
+    # angle of the edge (u, v) around u
+    def angle(self, u, v):
+        (x1, y1), (x2, y2) = self.coords[u], self.coords[v]
+        return atan2(y2 - y1, x2 - x1)
+
+    def addVertex(self, v, coord):
+        self.coords[v] = coord
+        self.rotation.setdefault(v, [])
+
+    def addEdge(self, u, v):
+        if u == v or v in self.rotation[u]: return # points snapped together can repeat an edge
+        for a, b in ((u, v), (v, u)):
+            # neighbors at the same angle (overlapping edges) are ordered by vertex, so the
+            # rotation doesn't depend on the order the edges were added in
+            neighbors, key = self.rotation[a], (self.angle(a, b), b)
+            i = 0
+            while i < len(neighbors) and (self.angle(a, neighbors[i]), neighbors[i]) <= key: i += 1
+            neighbors.insert(i, b)
+            self.dirty.add(a)
+
+    def removeEdge(self, u, v):
+        for a, b in ((u, v), (v, u)):
+            self.rotation[a].remove(b)
+            self.dirty.add(a)
+            faceId = self.faceOf.pop((a, b), None)
+            if faceId is not None: self.staleFaces.add(faceId)
+
+    # remove v and all of its edges
+    def removeVertex(self, v):
+        for w in list(self.rotation[v]):
+            self.removeEdge(v, w)
+        del self.rotation[v], self.coords[v]
+        self.dirty.discard(v)
+
+    # w is a new vertex that lies on the edge u-v
+    def splitEdge(self, u, v, w):
+        if v in self.rotation[u]: # not there if u or v was snapped to another point
+            # both halves of each half-edge keep the face it was on, to find parent faces in update()
+            for a, b in ((u, v), (v, u)):
+                faceId = self.faceOf.get((a, b), self.splitFaces.get((a, b)))
+                self.splitFaces[(a, w)] = self.splitFaces[(w, b)] = faceId
+            self.removeEdge(u, v)
+        self.addEdge(u, w)
+        self.addEdge(w, v)
+
+    # half-edge that follows (u, v) around its face
+    def nextHalfEdge(self, u, v):
+        neighbors = self.rotation[v]
+        return (v, neighbors[neighbors.index(u) - 1])
+
+    # rotate a vertex cycle so it starts at its smallest vertex. Two traces of the same face
+    # give the same key
+    def faceKey(self, cycle):
+        i = cycle.index(min(cycle))
+        return tuple(cycle[i:] + cycle[:i])
+
+    # same rule Graph.buildRegions uses to decide if a face is a region. Faces here go around
+    # the opposite way to Graph's, so the exterior faces are the ones with negative area
+    def isRegion(self, cycle):
+        return len(cycle) > 2 and len(cycle) == len(set(cycle)) and \
+               signedArea([self.coords[v] for v in cycle]) >= 0
+
+    # re-trace all faces touched since the last call
+    # returns ({faceId : cycle} of created regions, {faceId : cycle} of all destroyed faces,
+    # {faceId : parentId} the destroyed face each created face was cut from)
+    def update(self):
+        # Step 1: any face passing through a dirty vertex has changed
+        toDestroy = set(self.staleFaces)
+        for v in self.dirty:
+            for w in self.rotation[v]:
+                for halfEdge in ((v, w), (w, v)):
+                    if halfEdge in self.faceOf: toDestroy.add(self.faceOf[halfEdge])
+
+        # Step 2: remove those faces, remembering their half-edges as starting points
+        # and which face each of those half-edges was on
+        destroyed, starts, oldFaceOf = {}, [], dict(self.splitFaces)
+        for faceId in toDestroy:
+            cycle = self.faces.pop(faceId)
+            destroyed[self.faceKey(list(cycle))] = (faceId, cycle)
+            for i in range(len(cycle)):
+                halfEdge = (cycle[i], cycle[(i+1) % len(cycle)])
+                if self.faceOf.get(halfEdge) == faceId:
+                    del self.faceOf[halfEdge]
+                    starts.append(halfEdge)
+                    oldFaceOf[halfEdge] = faceId
+        for v in self.dirty:
+            for w in self.rotation[v]:
+                starts.extend([(v, w), (w, v)])
+
+        # Step 3: walk every half-edge without a face around its new face
+        # the parent of a new face is the old face of any of its half-edges
+        created, parents = {}, {}
+        for start in starts:
+            if start in self.faceOf or start[1] not in self.rotation[start[0]]: continue
+            cycle, halfEdge = [], start
+            while True:
+                cycle.append(halfEdge[0])
+                halfEdge = self.nextHalfEdge(*halfEdge)
+                if halfEdge == start: break
+
+            # a face that was traced again unchanged keeps its old id
+            key = self.faceKey(cycle)
+            if key in destroyed:
+                faceId = destroyed.pop(key)[0]
+            else:
+                faceId = self.nextFaceId
+                self.nextFaceId += 1
+                created[faceId] = tuple(cycle)
+                for i in range(len(cycle)):
+                    parentId = oldFaceOf.get((cycle[i], cycle[(i+1) % len(cycle)]))
+                    if parentId is not None:
+                        parents[faceId] = parentId
+                        break
+
+            self.faces[faceId] = tuple(cycle)
+            for i in range(len(cycle)):
+                self.faceOf[(cycle[i], cycle[(i+1) % len(cycle)])] = faceId
+
+        self.dirty, self.staleFaces, self.splitFaces = set(), set(), {}
+        return ({f: c for f, c in created.items() if self.isRegion(c)},
+                dict(destroyed.values()),
+                parents)
@@ -0,0 +1,98 @@
+# Checks of graph.Graph against the walk it replaced, on the graphs FaceEngine builds
+# for random drawings. Run with python -m pytest
+
+import random
+
+import pytest
+
+from face_engine import FaceEngine
+from face_metrics import signedArea
+from graph import Graph
+
+# lines drawn between random points, or between a few shared points like pecks on the
+# same spots, which gives lines that share points of intersection
+def randomLines(seed, n=40, points=None):
+    rng = random.Random(seed)
+    if points is None:
+        return [[(rng.randint(0, 800), rng.randint(0, 600)) for _ in range(2)] for _ in range(n)]
+    pecks = [(rng.randint(0, 800), rng.randint(0, 600)) for _ in range(points)]
+    return [rng.sample(pecks, 2) for _ in range(n)]
+
+# the engine after each line of a drawing. Only engines that solve the whole graph keep it
+def engineStates(lines, snapTolerance=0):
+    engine = FaceEngine(snapTolerance, incremental=False)
+    for line in lines:
+        engine.add_segment(line)
+        yield engine
+
+DRAWINGS = [(seed, points, snap) for seed in range(10) for points, snap in ((None, 0), (15, 0), (15, 3))]
+
+# Graph.buildRegions as it was before the cursor: the first unused wedge is found by
+# scanning self.used from the start for every region
+class ScanGraph(Graph):
+    def buildRegions(self):
+        def findUnused():
+            for k, v in self.used.items():
+                if v == 0:
+                    return k
+            return None
+
+        self.wedges = sorted(self.wedges, key=lambda x: (x[0], x[1]))
+        self.used = {w:0 for w in self.wedges}
+
+        w0 = findUnused()
+        self.used[w0] = 1
+        ind0 = w0
+        nextFirst, nextSecond = ind0[1], ind0[2]
+        wedgeList = [ind0]
+
+        while self.used:
+            wi = self.searchWedge(nextFirst, nextSecond)
+            self.used[wi] = 1
+            nextFirst, nextSecond = wi[1], wi[2]
+            wedgeList.append(wi)
+
+            if (nextFirst != ind0[0]) and (nextSecond != ind0[1]): continue
+            else:
+                region = [x[1] for x in wedgeList]
+                if len(region) > 2 and len(region) == len(set(region)) and \
+                   signedArea([self.coords[i] for i in region]) <= 0:
+                    self.regions.append(region)
+
+                wedgeList = []
+                w0 = findUnused()
+                if not w0: break
+                self.used[w0] = 1
+                ind0 = w0
+                nextFirst, nextSecond = ind0[1], ind0[2]
+                wedgeList.append(ind0)
+
+@pytest.mark.parametrize("seed, points, snap", DRAWINGS)
+def test_cursor_matches_scan(seed, points, snap):
+    for engine in engineStates(randomLines(seed, points=points), snap):
+        if len(engine.graph) <= 1: continue
+        assert Graph(engine.graph, engine.vertices).solve() == ScanGraph(engine.graph, engine.vertices).solve()
+
+# lines that share points of intersection also share the edges between them,
+# but the engine's graph must have each edge once
+@pytest.mark.parametrize("seed, points, snap", DRAWINGS)
+def test_graph_has_each_edge_once(seed, points, snap):
+    for engine in engineStates(randomLines(seed, points=points), snap):
+        edges = [frozenset((u, v)) for u, neighbors in engine.graph.items() for v in neighbors]
+        assert len(edges) == len(set(edges))
+
+def test_repeated_edge_raises():
+    coords = {0: (0, 0), 1: (10, 0), 2: (0, 10)}
+    with pytest.raises(ValueError):
+        Graph({0: [1, 2], 1: [2, 0]}, coords).solve()
+
+# the CSR path must find the same regions, in the same order, as the wedge walk
+@pytest.mark.parametrize("seed, points, snap", DRAWINGS)
+def test_csr_matches_walk(seed, points, snap):
+    np = pytest.importorskip("numpy")
+    from graph import toCSR
+    for engine in engineStates(randomLines(seed, points=points), snap):
+        if len(engine.graph) <= 1: continue
+        coords = (np.array(engine.vertices.xs), np.array(engine.vertices.ys))
+        csr = Graph(toCSR(engine.graph, len(engine.vertices)), coords).solve()
+        assert csr == Graph(engine.graph, engine.vertices).solve()
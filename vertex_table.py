@@ -0,0 +1,40 @@
+from array import array
+
+# Interned table of every vertex (point of intersection) of the painting.
+# A vertex is an integer id, and its coordinates are kept in two flat arrays of doubles,
+# instead of a Point object on every line through it and a (x, y) tuple in several dicts.
+# Coordinates are interned: a coordinate only ever gets one id, so lines that cross at
+# exactly the same place share one vertex. Faces are tuples of ids.
+# Ids are never reused, so a removed vertex keeps its slot in the arrays.
+
+class VertexTable:
+    def __init__(self):
+        self.xs, self.ys = array('d'), array('d') # coordinates of vertex i are (xs[i], ys[i])
+        self.ids = {} # {(x, y) : id} of every vertex that wasn't removed
+
+    def __len__(self):
+        return len(self.xs)
+
+    # (x, y) of vertex i
+    def __getitem__(self, i):
+        return (self.xs[i], self.ys[i])
+
+    # add a vertex at coord. Returns its id
+    def add(self, coord):
+        i = len(self.xs)
+        self.xs.append(coord[0])
+        self.ys.append(coord[1])
+        self.ids[coord] = i
+        return i
+
+    # id of the vertex at exactly coord, or None
+    def find(self, coord):
+        return self.ids.get(coord)
+
+    def remove(self, i):
+        if self.ids.get(self[i]) == i: del self.ids[self[i]]
+
+    # (x, y) of each vertex in ids, e.g. to draw a face
+    def coords(self, ids):
+        xs, ys = self.xs, self.ys
+        return [(xs[i], ys[i]) for i in ids]